@@ -0,0 +1,443 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark for the Document Analysis Tool.
+
+Generates a synthetic legal corpus from a fixed seed: .docx, .xlsx, text PDFs and image-only
+(scanned) PDFs, each with known keyword, date and amount counts. The analysis pipeline then runs
+on it offline. Wall time, throughput and peak RSS are written as JSON, per stage and per file type,
+together with extraction accuracy against the planted counts. A speedup can then be checked
+against the same numbers to confirm it did not break the results.
+
+    python benchmark.py --files-per-type 5 --paragraphs 40 --output benchmark.json
+
+Stage times inside a document (extraction, dates_amounts, keywords, entities) come from the
+timings of each result record. Peak RSS is sampled per file type for the analysis, and separately
+for summarization, word clouds and report writing. OCR runs in tesseract subprocesses, so its
+memory is not part of the RSS figures.
+
+--compare-summarizers int8 small also runs those summarization backends on the corpus keyword
+texts and reports their speed and their ROUGE-L F1 against the summaries of the fp32 default.
+"""
+
+import os
+import sys
+import json
+import contextlib
+import time
+import random
+import argparse
+import platform
+import tempfile
+import threading
+import importlib.util
+
+# The benchmark never downloads models or data
+os.environ.setdefault("HF_HUB_OFFLINE", "1")
+os.environ.setdefault("TRANSFORMERS_OFFLINE", "1")
+
+TOOL_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "document_analysis_tool DA2.py")
+
+def load_tool():
+    """Imports the analysis script as the module `document_analysis_tool`."""
+    spec = importlib.util.spec_from_file_location("document_analysis_tool", TOOL_PATH)
+    module = importlib.util.module_from_spec(spec)
+    # Registered before it runs, so process pools can pickle its functions
+    sys.modules["document_analysis_tool"] = module
+    spec.loader.exec_module(module)
+    return module
+
+tool = load_tool()
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+
+# Synthetic corpus
+# Filler words are made-up syllable strings, so they never collide with keywords, dates or amounts.
+PLANTED_KEYWORDS = ["indemnity", "arbitration", "warranty", "subpoena", "easement", "novation"]
+FILE_TYPES = [".docx", ".xlsx", ".pdf", "scanned.pdf"]
+_SYLLABLES = ["ka", "lo", "mi", "zu", "ten", "vor", "qua", "rel", "bis", "dra", "nop", "sel"]
+_MONTHS = ["January", "February", "March", "April", "June", "July", "August", "September",
+           "October", "November", "December"]
+
+def make_paragraph(rng, words, truth):
+    """Returns one paragraph of filler with planted keywords, dates and amounts, updating truth."""
+    tokens = ["".join(rng.choice(_SYLLABLES) for _ in range(rng.randint(2, 3))) for _ in range(words)]
+
+    planted = []
+    for _ in range(rng.randint(1, 2)):
+        keyword = rng.choice(PLANTED_KEYWORDS)
+        truth["keywords"][keyword] = truth["keywords"].get(keyword, 0) + 1
+        planted.append(keyword)
+    if rng.random() < 0.4:
+        year, month, day = rng.randint(2015, 2030), rng.randint(1, 12), rng.randint(1, 28)
+        date_text = rng.choice([
+            f"{_MONTHS[month % len(_MONTHS)]} {day}, {year}",
+            f"{year}-{month:02d}-{day:02d}",
+            f"{month:02d}/{day:02d}/{year}",
+        ])
+        truth["dates"].append(date_text)
+        planted.append(date_text)
+    if rng.random() < 0.4:
+        amount_text = f"${rng.randint(1, 999)},{rng.randint(0, 999):03d}.{rng.randint(0, 99):02d}"
+        truth["amounts"].append(amount_text)
+        planted.append(amount_text)
+
+    for item in planted:
+        tokens.insert(rng.randint(0, len(tokens)), item)
+    return " ".join(tokens) + "."
+
+def wrap_lines(paragraphs, width=80):
+    lines = []
+    for paragraph in paragraphs:
+        line = ""
+        for word in paragraph.split():
+            if line and len(line) + 1 + len(word) > width:
+                lines.append(line)
+                line = word
+            else:
+                line = f"{line} {word}" if line else word
+        lines.append(line)
+    return lines
+
+def write_docx(path, paragraphs):
+    document = tool.WordDocument()
+    for paragraph in paragraphs:
+        document.add_paragraph(paragraph)
+    document.save(path)
+
+def write_xlsx(path, paragraphs):
+    from openpyxl import Workbook
+    workbook = Workbook()
+    worksheet = workbook.active
+    for paragraph in paragraphs:
+        words = paragraph.split()
+        worksheet.append([" ".join(words[i:i + 8]) for i in range(0, len(words), 8)])
+    workbook.save(path)
+
+def write_text_pdf(path, paragraphs, lines_per_page=50):
+    """Writes a minimal PDF with a real text layer, using the built-in Helvetica font."""
+    lines = wrap_lines(paragraphs)
+    pages = [lines[i:i + lines_per_page] for i in range(0, len(lines), lines_per_page)] or [[]]
+
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>", None,
+               b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    page_ids = []
+    for page_lines in pages:
+        text = "".join("({}) Tj T*\n".format(line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)"))
+                       for line in page_lines)
+        stream = f"BT /F1 10 Tf 12 TL 50 770 Td\n{text}ET".encode("latin-1", "replace")
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        objects.append(b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+                       b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % len(objects))
+        page_ids.append(len(objects))
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (
+        " ".join(f"{page_id} 0 R" for page_id in page_ids).encode(), len(page_ids))
+
+    output = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(output))
+        output += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref_offset = len(output)
+    output += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    output += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    output += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref_offset)
+    with open(path, "wb") as f:
+        f.write(output)
+
+def write_scanned_pdf(path, paragraphs, lines_per_page=40):
+    """Writes an image-only PDF: each page is a rendered bitmap with no text layer."""
+    from PIL import Image, ImageDraw, ImageFont
+    try:
+        font = ImageFont.truetype("DejaVuSans.ttf", 28)
+    except OSError:
+        try:
+            font = ImageFont.load_default(size=28)
+        except TypeError:
+            font = ImageFont.load_default()
+
+    lines = wrap_lines(paragraphs, width=70)
+    pages = []
+    for i in range(0, max(len(lines), 1), lines_per_page):
+        page = Image.new("L", (1700, 2200), 255)
+        draw = ImageDraw.Draw(page)
+        for row, line in enumerate(lines[i:i + lines_per_page]):
+            draw.text((100, 100 + row * 48), line, fill=0, font=font)
+        pages.append(page)
+    pages[0].save(path, "PDF", save_all=True, append_images=pages[1:], resolution=200)
+
+WRITERS = {".docx": write_docx, ".xlsx": write_xlsx, ".pdf": write_text_pdf, "scanned.pdf": write_scanned_pdf}
+
+def generate_corpus(corpus_dir, seed=0, files_per_type=3, paragraphs=30, words=40, file_types=FILE_TYPES):
+    """Writes the synthetic corpus and returns {file path: (file type, truth)}."""
+    rng = random.Random(seed)
+    corpus = {}
+    for file_type in file_types:
+        for index in range(files_per_type):
+            truth = {"keywords": {}, "dates": [], "amounts": []}
+            document = [make_paragraph(rng, words, truth) for _ in range(paragraphs)]
+            suffix = file_type if file_type.startswith(".") else "_" + file_type
+            path = os.path.join(corpus_dir, f"synthetic_{index:03d}{suffix}")
+            WRITERS[file_type](path, document)
+            corpus[path] = (file_type, truth)
+    return corpus
+
+
+# Measurement
+def current_rss():
+    """Returns the resident set size of this process in bytes, or None if it cannot be read."""
+    if psutil is not None:
+        return psutil.Process().memory_info().rss
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+class PeakRSS:
+    """Context manager that samples RSS on a background thread and keeps the peak in MB."""
+
+    def __init__(self, interval=0.01):
+        self.interval = interval
+        self.peak_mb = None
+        self._stop = threading.Event()
+
+    def _sample(self):
+        rss = current_rss()
+        if rss is not None:
+            self.peak_mb = max(self.peak_mb or 0.0, rss / (1024 * 1024))
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def __enter__(self):
+        self._sample()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+        self._sample()
+        return False
+
+def _max(a, b):
+    return b if a is None else a if b is None else max(a, b)
+
+def check_accuracy(record, truth):
+    """Compares a result record with the planted counts of its document."""
+    normalize = lambda text: " ".join(text.split())
+    keyword_errors = {keyword: record["keywords"].get(keyword, 0) - count
+                      for keyword, count in truth["keywords"].items()}
+    extracted_dates = [normalize(date["text"]) for date in record["dates"]]
+    dates_found = sum(1 for date_text in truth["dates"] if date_text in extracted_dates)
+    amounts_found = sum(1 for amount_text in truth["amounts"]
+                        if any(amount_text in normalize(amount["text"]) for amount in record["amounts"]))
+    return {
+        "keywords_exact": all(error == 0 for error in keyword_errors.values()),
+        "keyword_abs_error": sum(abs(error) for error in keyword_errors.values()),
+        "keywords_planted": sum(truth["keywords"].values()),
+        "dates_planted": len(truth["dates"]),
+        "dates_found": dates_found,
+        "dates_extracted": len(extracted_dates),
+        "amounts_planted": len(truth["amounts"]),
+        "amounts_found": amounts_found,
+    }
+
+def lcs_length(a, b):
+    previous = [0] * (len(b) + 1)
+    for token in a:
+        current = [0]
+        for j, other in enumerate(b):
+            current.append(previous[j] + 1 if token == other else max(previous[j + 1], current[j]))
+        previous = current
+    return previous[-1]
+
+def rouge_l(reference, candidate):
+    """Returns the ROUGE-L F1 score of a candidate summary against a reference summary."""
+    reference, candidate = reference.lower().split(), candidate.lower().split()
+    lcs = lcs_length(reference, candidate)
+    if not lcs:
+        return 0.0
+    precision, recall = lcs / len(candidate), lcs / len(reference)
+    return 2 * precision * recall / (precision + recall)
+
+def compare_summarizer_backends(sample, backends, threads=None):
+    """Summarizes the same sample with each backend and scores it against the fp32 reference.
+
+    Returns {backend: measurements}: load time, RSS added by loading the model, summarization time
+    and the mean ROUGE-L F1 against the summaries of the default fp32 backend. Models stay loaded,
+    so the RSS figures add up in the order the backends are given.
+    """
+    comparison = {}
+    references = None
+    for name in ["fp32"] + [name for name in backends if name != "fp32"]:
+        backend = tool.summarizer_backend(name, threads)
+        rss_before = current_rss()
+        start = time.perf_counter()
+        loaded = tool.get_summarizer(backend) is not None
+        load_seconds = time.perf_counter() - start
+        rss_after = current_rss()
+        if not loaded:
+            comparison[name] = {"error": "backend could not be loaded"}
+            continue
+
+        start = time.perf_counter()
+        summaries = tool.batch_summarization(sample, backend=backend)
+        seconds = time.perf_counter() - start
+        if name == "fp32":
+            references = summaries
+        comparison[name] = {
+            "load_seconds": round(load_seconds, 4),
+            "load_rss_mb": round((rss_after - rss_before) / (1024 * 1024), 1) if rss_before and rss_after else None,
+            "seconds": round(seconds, 4),
+            "texts_per_second": round(len(sample) / seconds, 3) if seconds else None,
+            "rouge_l_vs_fp32": round(sum(rouge_l(reference, summary) for reference, summary in zip(references, summaries))
+                                     / len(sample), 4) if references and sample else None,
+        }
+    return {name: comparison[name] for name in backends if name in comparison}
+
+def run_benchmark(corpus, work_dir, wordclouds=False, summarizer=None, compare_summarizers=()):
+    """Runs the pipeline over the corpus in this process and returns the measurements.
+
+    summarizer is the summarization backend of the run. Each backend in compare_summarizers is also
+    timed on the keyword texts of the corpus and scored against the default fp32 backend.
+    """
+    results = {"startup": {}, "by_type": {}, "stages": {}, "accuracy": {}}
+
+    # Model and keyword index loading is measured on its own, outside the per-file numbers
+    start = time.perf_counter()
+    tool.get_keyword_matcher(tool.get_expanded_keywords())
+    tool.get_nlp()
+    tool.get_summarizer(summarizer)
+    results["startup"] = {"seconds": round(time.perf_counter() - start, 4),
+                          "components": {name: round(seconds, 4) for name, seconds in tool.COMPONENT_LOAD_TIMES.items()}}
+
+    records = []
+    stage_seconds = {}
+    run_start = time.perf_counter()
+    for file_path, (file_type, truth) in corpus.items():
+        with PeakRSS() as rss:
+            start = time.perf_counter()
+            record = tool.analyze_document(file_path)
+            seconds = time.perf_counter() - start
+        records.append(record)
+
+        by_type = results["by_type"].setdefault(file_type, {"files": 0, "bytes": 0, "seconds": 0.0,
+                                                            "peak_rss_mb": None, "stages": {}})
+        by_type["files"] += 1
+        by_type["bytes"] += os.path.getsize(file_path)
+        by_type["seconds"] += seconds
+        by_type["peak_rss_mb"] = _max(by_type["peak_rss_mb"], rss.peak_mb)
+        for stage, stage_time in record["timings"].items():
+            by_type["stages"][stage] = by_type["stages"].get(stage, 0.0) + stage_time
+            stage_seconds[stage] = stage_seconds.get(stage, 0.0) + stage_time
+
+        accuracy = results["accuracy"].setdefault(file_type, {})
+        for name, value in check_accuracy(record, truth).items():
+            accuracy[name] = accuracy.get(name, 0) + value
+    analysis_seconds = time.perf_counter() - run_start
+
+    for file_type, by_type in results["by_type"].items():
+        by_type["files_per_second"] = round(by_type["files"] / by_type["seconds"], 3) if by_type["seconds"] else None
+        by_type["mb_per_second"] = round(by_type["bytes"] / (1024 * 1024) / by_type["seconds"], 3) if by_type["seconds"] else None
+        by_type["seconds"] = round(by_type["seconds"], 4)
+        by_type["stages"] = {stage: round(seconds, 4) for stage, seconds in by_type["stages"].items()}
+    for file_type, accuracy in results["accuracy"].items():
+        accuracy["files_with_exact_keywords"] = accuracy.pop("keywords_exact")
+        accuracy["date_recall"] = round(accuracy["dates_found"] / accuracy["dates_planted"], 3) if accuracy["dates_planted"] else None
+        accuracy["amount_recall"] = round(accuracy["amounts_found"] / accuracy["amounts_planted"], 3) if accuracy["amounts_planted"] else None
+
+    for stage, seconds in stage_seconds.items():
+        results["stages"][stage] = {"seconds": round(seconds, 4)}
+    results["stages"]["analysis_total"] = {"seconds": round(analysis_seconds, 4),
+                                           "files_per_second": round(len(records) / analysis_seconds, 3)}
+
+    with PeakRSS() as rss:
+        start = time.perf_counter()
+        tool.summarize_records(records, summarizer)
+        seconds = time.perf_counter() - start
+    results["stages"]["summarization"] = {"seconds": round(seconds, 4), "peak_rss_mb": rss.peak_mb}
+
+    if compare_summarizers:
+        sample = [" ".join(tool.found_keywords_of(record)) for record in records if tool.found_keywords_of(record)]
+        results["summarizer_backends"] = compare_summarizer_backends(
+            sample, compare_summarizers, tool.summarizer_backend(summarizer).threads)
+
+    wordcloud_paths = {}
+    if wordclouds:
+        with PeakRSS() as rss:
+            start = time.perf_counter()
+            for record in records:
+                found_keywords = tool.found_keywords_of(record)
+                if found_keywords:
+                    wordcloud_paths[record["file"]] = tool.generate_wordcloud(
+                        found_keywords, tool.wordcloud_image_path(work_dir, record["file"]))
+            seconds = time.perf_counter() - start
+        results["stages"]["wordclouds"] = {"seconds": round(seconds, 4), "peak_rss_mb": rss.peak_mb}
+
+    with PeakRSS() as rss:
+        start = time.perf_counter()
+        report = tool.WordDocument()
+        report.add_heading("Enhanced Files Analysis Report", 0)
+        for record in records:
+            tool.add_analysis_to_report(report, os.path.basename(record["file"]), record,
+                                        wordcloud_paths.get(record["file"]))
+        report.save(os.path.join(work_dir, tool.REPORT_FILENAME))
+        seconds = time.perf_counter() - start
+    results["stages"]["report"] = {"seconds": round(seconds, 4), "peak_rss_mb": rss.peak_mb}
+
+    results["total_seconds"] = round(time.perf_counter() - run_start, 4)
+    return results
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the document analysis pipeline on a synthetic corpus.")
+    parser.add_argument("--seed", type=int, default=0, help="Corpus random seed (default: %(default)s)")
+    parser.add_argument("--files-per-type", type=int, default=3, help="Documents of each type (default: %(default)s)")
+    parser.add_argument("--paragraphs", type=int, default=30, help="Paragraphs per document (default: %(default)s)")
+    parser.add_argument("--words", type=int, default=40, help="Filler words per paragraph (default: %(default)s)")
+    parser.add_argument("--types", nargs="+", choices=FILE_TYPES, default=FILE_TYPES, help="File types to generate")
+    parser.add_argument("--wordclouds", action="store_true", help="Also time word cloud rendering")
+    parser.add_argument("--summarizer", choices=sorted(tool.SUMMARIZER_BACKENDS), default=tool.SUMMARIZER_BACKEND,
+                        help="Summarization backend of the run (default: %(default)s)")
+    parser.add_argument("--summarizer-threads", type=int, help="Intra-op threads for summarization")
+    parser.add_argument("--compare-summarizers", nargs="+", choices=sorted(tool.SUMMARIZER_BACKENDS), default=[],
+                        metavar="BACKEND", help="Also time these backends and score their summaries against fp32 with ROUGE-L")
+    parser.add_argument("--corpus-dir", help="Keep the corpus and report in this directory instead of a temporary one")
+    parser.add_argument("--output", help="Write the JSON results to this file instead of stdout")
+    args = parser.parse_args(argv)
+
+    # Progress messages of the tool go to stderr, so stdout only carries the JSON results
+    with tempfile.TemporaryDirectory() as temp_dir, contextlib.redirect_stdout(sys.stderr):
+        corpus_dir = args.corpus_dir or temp_dir
+        os.makedirs(corpus_dir, exist_ok=True)
+        start = time.perf_counter()
+        corpus = generate_corpus(corpus_dir, args.seed, args.files_per_type, args.paragraphs, args.words, args.types)
+        generation_seconds = time.perf_counter() - start
+
+        results = {
+            "config": {"seed": args.seed, "files_per_type": args.files_per_type, "paragraphs": args.paragraphs,
+                       "words": args.words, "types": args.types, "wordclouds": args.wordclouds,
+                       "summarizer": args.summarizer, "summarizer_threads": args.summarizer_threads},
+            "environment": {"python": platform.python_version(), "platform": platform.platform(),
+                            "cpu_count": os.cpu_count(), "spacy_model": tool.SPACY_MODEL,
+                            "summarizer_model": tool.summarizer_backend(args.summarizer).model},
+            "corpus_generation_seconds": round(generation_seconds, 4),
+        }
+        summarizer = tool.summarizer_backend(args.summarizer, args.summarizer_threads)
+        results.update(run_benchmark(corpus, corpus_dir, args.wordclouds, summarizer, args.compare_summarizers))
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+if __name__ == "__main__":
+    main()
@@ -6,7 +6,7 @@ Created on Sat Nov  2 11:59:59 2024
 @author: mcall
 """
 
- """    The project, Legal Document Analyzer with Summarization and Keyword Extraction, integrates several advanced technologies to enhance the analysis of legal documents:
+"""    The project, Legal Document Analyzer with Summarization and Keyword Extraction, integrates several advanced technologies to enhance the analysis of legal documents:
 
    Natural Language Processing (NLP):
         SpaCy: Utilized for tokenization, named entity recognition (NER), and part-of-speech tagging, enabling the extraction of entities such as organizations, locations, and individuals from text.
@@ -35,6 +35,7 @@ Created on Sat Nov  2 11:59:59 2024
         Regular Expressions (regex): Identifies monetary amounts within text, supporting multiple currency symbols and formats.
 
    By integrating these technologies, the project offers a comprehensive solution for analyzing legal documents, extracting pertinent information, and providing concise summaries, thereby streamlining the review process for legal professionals.
+"""
 #                          Summary of functionality
 #1. Document Type Handling:
 
@@ -93,35 +94,91 @@ Created on Sat Nov  2 11:59:59 2024
 
 import os
 import re
+import json
+import argparse
+import tempfile
+import time
+import hashlib
+import zlib
+import zipfile
+import posixpath
+import sqlite3
+import queue
+import threading
+import multiprocessing
+from datetime import datetime
+from fnmatch import fnmatch
+from bisect import bisect_right
+from collections import Counter, deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, TimeoutError as FuturesTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache, partial
+from xml.etree import ElementTree
+
+# Startup time is measured from here, before the third-party imports, until the window is shown
+_startup_time = time.perf_counter()
+
 import tkinter as tk
 from tkinter import filedialog, messagebox
-import spacy
-import pandas as pd
 import pytesseract
 from wordcloud import WordCloud
+import numpy as np
+import matplotlib
+matplotlib.use("Agg")  # Word clouds are rendered off-screen, never shown in a window
 import matplotlib.pyplot as plt
 from docx import Document as WordDocument
-from PyPDF2 import PdfReader
+from docx.shared import Inches
 import pdfplumber
 from openpyxl import load_workbook
-from transformers import pipeline
 import dateparser
 from pdf2image import convert_from_path
-from nltk.corpus import wordnet
-import nltk
-
-# Ensure NLTK wordnet data is downloaded
-nltk.download('wordnet')
 
 # Suppress TensorFlow oneDNN warning
 os.environ['TF_ENABLE_ONEDNN_OPTS'] = '0'
 os.environ["HF_HUB_DISABLE_SYMLINKS_WARNING"] = "1"
 
+# Models used by the analysis pipeline
+SPACY_MODEL = "en_core_web_sm"
+SUMMARIZER_MODEL = "sshleifer/distilbart-cnn-12-6"
+
+# Lazy Component Loading
+# spaCy, the summarizer and the expanded keyword set are loaded on first use (or in the background
+# once the window is up) rather than at import time. Each load is timed in COMPONENT_LOAD_TIMES.
+COMPONENT_LOAD_TIMES = {}
+_components = {}
+_component_locks = {}
+_component_locks_guard = threading.Lock()
+
+def _load_component(name, loader, key=None):
+    """Returns a component, calling loader the first time it is needed and recording the load time.
+
+    Components are cached by key, which defaults to the display name."""
+    key = name if key is None else key
+    with _component_locks_guard:
+        lock = _component_locks.setdefault(key, threading.Lock())
+    with lock:
+        if key not in _components:
+            start = time.perf_counter()
+            _components[key] = loader()
+            COMPONENT_LOAD_TIMES[name] = time.perf_counter() - start
+            print(f"Loaded {name} in {COMPONENT_LOAD_TIMES[name]:.2f}s")
+        return _components[key]
+
 # Load SpaCy language model
-try:
-    nlp = spacy.load("en_core_web_sm")
-except OSError:
-    print("SpaCy language model 'en_core_web_sm' is not installed. Run 'python -m spacy download en_core_web_sm' to install it.")
+def _load_spacy_model():
+    import spacy
+    try:
+        nlp = spacy.load(SPACY_MODEL)
+    except OSError:
+        print("SpaCy language model 'en_core_web_sm' is not installed. Run 'python -m spacy download en_core_web_sm' to install it.")
+        raise
+    # Only named entities are used, so the tagger, parser and lemmatizer are switched off
+    nlp.select_pipes(enable=[name for name in ("tok2vec", "ner") if name in nlp.pipe_names])
+    return nlp
+
+def get_nlp():
+    """Returns the spaCy pipeline, loading it on first use."""
+    return _load_component("spaCy model", _load_spacy_model)
 
 
 #                   Machine Learning Component: Text Summarization
@@ -150,11 +207,60 @@ except OSError:
 #   without the need for custom model training, making the tool both efficient and easy to use.
 #                                      End of Summary
 
+# Summarization Backends
+# The summarizer runs on CPU. A backend picks the checkpoint, whether its linear layers get dynamic
+# int8 quantization, and the number of intra-op threads torch may use. "small" is a distilled
+# checkpoint with half the decoder layers, and it is only loaded if it is already downloaded.
+# The thread count applies to the whole process, so the backend loaded last sets it.
+SummarizerBackend = namedtuple("SummarizerBackend", ["model", "quantize", "local_only", "threads"])
+
+SUMMARIZER_SMALL_MODEL = "sshleifer/distilbart-cnn-6-6"
+SUMMARIZER_BACKENDS = {
+    "fp32": SummarizerBackend(SUMMARIZER_MODEL, quantize=False, local_only=False, threads=None),
+    "int8": SummarizerBackend(SUMMARIZER_MODEL, quantize=True, local_only=False, threads=None),
+    "small": SummarizerBackend(SUMMARIZER_SMALL_MODEL, quantize=False, local_only=True, threads=None),
+    "small-int8": SummarizerBackend(SUMMARIZER_SMALL_MODEL, quantize=True, local_only=True, threads=None),
+}
+SUMMARIZER_BACKEND = "fp32"  # Backend used when none is given
+SUMMARIZER_THREADS = None  # Intra-op threads; None keeps the torch default
+
+def summarizer_backend(backend=None, threads=None, model=None):
+    """Returns a SummarizerBackend from a backend name (or a SummarizerBackend) with optional overrides.
+
+    model replaces the checkpoint with a local one, given by its name in the cache or a directory.
+    """
+    if not isinstance(backend, SummarizerBackend):
+        backend = SUMMARIZER_BACKENDS[backend or SUMMARIZER_BACKEND]
+    if model:
+        backend = backend._replace(model=model, local_only=True)
+    return backend._replace(threads=threads or backend.threads or SUMMARIZER_THREADS)
+
  #Initialize Summarization Pipeline with explicit model to avoid default warning
-try:
-    summarizer = pipeline("summarization", model="sshleifer/distilbart-cnn-12-6")
-except Exception as e:
-    print("Error initializing summarizer pipeline:", e)
+def _load_summarizer(backend):
+    try:
+        import torch
+        from transformers import AutoModelForSeq2SeqLM, AutoTokenizer, pipeline
+        if backend.threads:
+            torch.set_num_threads(backend.threads)
+        tokenizer = AutoTokenizer.from_pretrained(backend.model, local_files_only=backend.local_only)
+        model = AutoModelForSeq2SeqLM.from_pretrained(backend.model, local_files_only=backend.local_only)
+        model.eval()
+        if backend.quantize:
+            # Weights of the linear layers are stored as int8; activations are quantized on the fly
+            model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        return pipeline("summarization", model=model, tokenizer=tokenizer, device=-1)
+    except Exception as e:
+        print("Error initializing summarizer pipeline:", e)
+        return None
+
+def get_summarizer(backend=None):
+    """Returns the summarization pipeline of a backend (None if it could not be initialized), loading it on first use."""
+    backend = summarizer_backend(backend)
+    options = [os.path.basename(backend.model)] + ["int8"] * backend.quantize
+    if backend.threads:
+        options.append(f"{backend.threads} threads")
+    # Backends that share a checkpoint name can still differ in the model path or in local_only
+    return _load_component(f"summarizer ({', '.join(options)})", partial(_load_summarizer, backend), key=backend)
              
              # Synonym Expansion for Keywords (Including Legal Terms)
 keywords = ["contract", "agreement", "payment", "compliance", "fine", "lease", "memo" "contract", "agreement", "payment", "compliance", "fine", "lease", "memo", "settlement", "liability", "warranty", 
@@ -183,28 +289,141 @@ keywords = ["contract", "agreement", "payment", "compliance", "fine", "lease", "
 "plea bargain", "beyond reasonable doubt", "statute of limitations", "probate", "executor", "beneficiary", 
 "inheritance", "trustee", "settlor", "estate", "tax", "exemption", "fiduciary duty", "bankruptcy", "debtor", "creditor"]
 
-expanded_keywords = set(keywords)
+# Keyword Index
+# The WordNet expansion of the keyword list is computed once and saved as a versioned JSON file.
+# Later runs load it directly; it is rebuilt only when the keyword list or index format changes.
+KEYWORD_INDEX_PATH = os.path.join(os.path.expanduser("~"), ".document_analysis_keywords.json")
+KEYWORD_INDEX_FORMAT_VERSION = 1
 
-         # Expand keywords with synonyms using NLTK's wordnet
-for word in keywords:
-    for syn in wordnet.synsets(word):
-        for lemma in syn.lemmas():
-            expanded_keywords.add(lemma.name())
+def keyword_index_version():
+    """Returns a short hash of the base keyword list and the index format."""
+    index_description = json.dumps({"format": KEYWORD_INDEX_FORMAT_VERSION, "keywords": sorted(set(keywords))})
+    return hashlib.sha256(index_description.encode("utf-8")).hexdigest()[:16]
 
-        # Function to analyze text with NLP
-def analyze_text_with_nlp(text, keywords):
-    doc = nlp(text)
-    found_keywords = {}
-    
-              # Search for exact and expanded keywords
-    for keyword in keywords:
-        count = len(re.findall(r'\b' + re.escape(keyword) + r'\b', text, flags=re.IGNORECASE))
-        if count > 0:
-            found_keywords[keyword] = count
-
-             # Use NER to find named entities or relevant phrases
-    for ent in doc.ents:
-        if ent.label_ in ["ORG", "GPE", "PERSON", "PRODUCT", "EVENT","Supreme Court", "Federal Reserve", "NASDAQ", "Wall Street Journal", "Goldman Sachs", "Department of Justice", "International Monetary Fund", "SEC", "World Bank", "Bloomberg",
+def build_expanded_keywords():
+    """Expands the keyword list with synonyms using NLTK's wordnet."""
+    import nltk
+    from nltk.corpus import wordnet
+
+    # Download the wordnet data only if it is not installed yet
+    try:
+        wordnet.synsets("contract")
+    except LookupError:
+        nltk.download('wordnet')
+
+    expanded_keywords = set(keywords)
+    for word in keywords:
+        for syn in wordnet.synsets(word):
+            for lemma in syn.lemmas():
+                expanded_keywords.add(lemma.name())
+    return expanded_keywords
+
+def load_expanded_keywords():
+    """Loads the expanded keyword set from the keyword index, rebuilding the index if it is missing or stale."""
+    version = keyword_index_version()
+    try:
+        with open(KEYWORD_INDEX_PATH, encoding="utf-8") as f:
+            index = json.load(f)
+        if index.get("version") == version:
+            return set(index["keywords"])
+    except (OSError, ValueError):
+        pass
+
+    expanded_keywords = build_expanded_keywords()
+    try:
+        with open(KEYWORD_INDEX_PATH + ".tmp", "w", encoding="utf-8") as f:
+            json.dump({"version": version, "keywords": sorted(expanded_keywords)}, f)
+        os.replace(KEYWORD_INDEX_PATH + ".tmp", KEYWORD_INDEX_PATH)
+    except OSError as e:
+        print("Could not save keyword index:", e)
+    return expanded_keywords
+
+def get_expanded_keywords():
+    """Returns the WordNet-expanded keyword set, loading it on first use."""
+    return _load_component("keyword index", load_expanded_keywords)
+
+        # Keyword matching engine
+# All keywords are compiled into one trie-shaped regular expression, so a document is scanned
+# once instead of once per keyword. WordNet lemmas such as "legal_capacity" are matched as the
+# phrase "legal capacity". Counts follow the old per-keyword `\bkeyword\b` search exactly,
+# including keywords that overlap each other ("breach of contract" also counts "contract").
+_WORD_CHAR = re.compile(r"\w")
+
+class KeywordMatcher:
+    """Counts every keyword and multi-word phrase of a keyword set in a single pass."""
+
+    def __init__(self, keywords):
+        # Normalized phrase -> the keywords it reports (e.g. "legal capacity" and "legal_capacity")
+        self.phrases = {}
+        for keyword in keywords:
+            self.phrases.setdefault(keyword.replace("_", " ").lower(), []).append(keyword)
+
+        # Shorter keywords that also match wherever a longer phrase starts
+        self.prefixes = {phrase: self._boundary_prefixes(phrase) for phrase in self.phrases}
+
+        trie = {}
+        for phrase in self.phrases:
+            node = trie
+            for char in phrase:
+                node = node.setdefault(char, {})
+            node[""] = True
+        self.pattern = re.compile(r"\b(?=(" + self._trie_to_regex(trie) + r")\b)", re.IGNORECASE)
+
+    def _boundary_prefixes(self, phrase):
+        prefixes = []
+        for end in range(1, len(phrase)):
+            at_boundary = bool(_WORD_CHAR.match(phrase[end - 1])) != bool(_WORD_CHAR.match(phrase[end]))
+            if at_boundary and phrase[:end] in self.phrases:
+                prefixes.append(phrase[:end])
+        return prefixes
+
+    def _trie_to_regex(self, node):
+        branches = [re.escape(char) + self._trie_to_regex(child) for char, child in node.items() if char]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        if "" in node:
+            # Greedy optional group: the longest phrase is tried first
+            return "(?:" + body + ")?"
+        return body
+
+    def count(self, text):
+        """Returns {keyword: occurrences} for every keyword found in text."""
+        counts = {}
+        last_end = {}
+        for match in self.pattern.finditer(text):
+            start = match.start()
+            longest = match.group(1).lower()
+            if longest not in self.phrases:
+                continue
+            for phrase in [longest] + self.prefixes[longest]:
+                # A keyword never overlaps itself, as with re.findall
+                if start < last_end.get(phrase, 0):
+                    continue
+                last_end[phrase] = start + len(phrase)
+                counts[phrase] = counts.get(phrase, 0) + 1
+
+        found_keywords = {}
+        for phrase, count in counts.items():
+            for keyword in self.phrases[phrase]:
+                found_keywords[keyword] = count
+        return found_keywords
+
+_keyword_matchers = {}
+
+def get_keyword_matcher(keywords):
+    """Returns the matcher for a keyword collection, building it only the first time."""
+    key = frozenset(keywords)
+    if key not in _keyword_matchers:
+        _keyword_matchers[key] = KeywordMatcher(key)
+    return _keyword_matchers[key]
+
+# Named Entity Recognition
+# Only spaCy's NER component runs (see _load_spacy_model). Long texts are split into overlapping
+# chunks that stay under nlp.max_length, and chunks from many texts go through nlp.pipe together
+# (small files are analyzed in groups for this, see analyze_document_group).
+# Entities are kept when their label is in ALLOWED_ENTITIES, built once here instead of per call.
+ALLOWED_ENTITIES = frozenset(["ORG", "GPE", "PERSON", "PRODUCT", "EVENT","Supreme Court", "Federal Reserve", "NASDAQ", "Wall Street Journal", "Goldman Sachs", "Department of Justice", "International Monetary Fund", "SEC", "World Bank", "Bloomberg",
  "New York Stock Exchange", "KPMG", "Deloitte", "PwC", "Federal Trade Commission", "Harvard Law Review", "Oxford University Press", "Cambridge University Press", "Blackstone Chambers", "Legal Aid Society",
  "New York", "Washington, D.C.", "London", "Tokyo", "Zurich", "Frankfurt", "Hong Kong", "Singapore", "Paris", "Toronto",
  "Securities Act", "Bankruptcy Code", "Sarbanes-Oxley Act", "Dodd-Frank Act", "Uniform Commercial Code", "Fair Credit Reporting Act", "Sherman Antitrust Act", "Foreign Corrupt Practices Act", "Freedom of Information Act", "Clean Air Act",
@@ -227,112 +446,1460 @@ def analyze_text_with_nlp(text, keywords):
  "Title Insurance", "Real Estate Deed", "Shareholder Proxy", "Asset Purchase Agreement", "Settlement Check", "Proof of Funds", "Escrow Agreement", "Indemnification Agreement", "Business License", "Power of Attorney Document",
  "Intergovernmental Panel on Climate Change", "International Finance Corporation", "European Union Agency for Fundamental Rights", "Amnesty International", "Commonwealth Bank", "National Credit Union Administration", "Federal Deposit Insurance Corporation", "Trade Adjustment Assistance Program", "Financial Action Task Force", "The Hague Conference on Private International Law",
  "Equal Employment Opportunity Commission", "Health and Safety Executive", "Labor Board", "Anti-Money Laundering Act", "Gramm-Leach-Bliley Act", "Employment Rights Act", "Corporate Governance Code", "Private Securities Litigation Reform Act", "Whistleblower Protection Act", "Securities Exchange Act",
- "Reserve Bank of India", "People's Bank of China", "Bank of Japan", "Swiss National Bank", "Bank of England", "European Investment Bank", "Federal Deposit Insurance Corporation", "Export-Import Bank of the United States", "Asian Infrastructure Investment Bank", "African Development Bank"]:
-
-            if ent.text not in found_keywords:
-                found_keywords[ent.text] = 1
-            else:
-                found_keywords[ent.text] += 1
-
-    return found_keywords
-
-# Function to extract dates and monetary amounts
-def extract_info(text):
+ "Reserve Bank of India", "People's Bank of China", "Bank of Japan", "Swiss National Bank", "Bank of England", "European Investment Bank", "Federal Deposit Insurance Corporation", "Export-Import Bank of the United States", "Asian Infrastructure Investment Bank", "African Development Bank"])
+
+NER_BATCH_SIZE = 32  # Chunks per nlp.pipe batch
+NER_PROCESSES = 1  # nlp.pipe worker processes; keep at 1 when files already run in a process pool
+NER_CHUNK_CHARS = 100_000
+NER_CHUNK_OVERLAP = 500  # Context shared by neighbouring chunks
+
+def split_text_for_ner(text, chunk_chars=NER_CHUNK_CHARS, overlap=NER_CHUNK_OVERLAP):
+    """Splits text into overlapping chunks for NER.
+
+    Returns (chunk_text, own_start, own_end) tuples. An entity is taken from a chunk only when it
+    starts within [own_start, own_end), so the overlap adds context without counting anything twice.
+    """
+    chunks = []
+    start = 0
+    while True:
+        end = min(start + chunk_chars, len(text))
+        if end < len(text):
+            # Break between words so that few entities straddle a boundary
+            split = max(text.rfind(" ", start + chunk_chars // 2, end), text.rfind("\n", start + chunk_chars // 2, end))
+            if split > start:
+                end = split
+        context_start = max(0, start - overlap)
+        chunks.append((text[context_start:end + overlap], start - context_start, end - context_start))
+        if end >= len(text):
+            return chunks
+        start = end
+
+def extract_entities_batch(texts, batch_size=NER_BATCH_SIZE, n_process=NER_PROCESSES):
+    """Counts the allowed named entities of each text. Returns one {entity text: count} dict per text."""
+    nlp = get_nlp()
+    chunk_chars = min(NER_CHUNK_CHARS, nlp.max_length - 2 * NER_CHUNK_OVERLAP)
+
+    def chunks_with_owner():
+        for index, text in enumerate(texts):
+            for chunk_text, own_start, own_end in split_text_for_ner(text, chunk_chars):
+                yield chunk_text, (index, own_start, own_end)
+
+    entity_counts = [{} for _ in texts]
+    for doc, (index, own_start, own_end) in nlp.pipe(chunks_with_owner(), as_tuples=True,
+                                                     batch_size=batch_size, n_process=n_process):
+        counts = entity_counts[index]
+        for ent in doc.ents:
+            if own_start <= ent.start_char < own_end and ent.label_ in ALLOWED_ENTITIES:
+                counts[ent.text] = counts.get(ent.text, 0) + 1
+    return entity_counts
+
+# Date extraction
+# Candidate date spans are found with precompiled patterns first, and only those spans are
+# handed to dateparser. Lines without a date (or made only of numbers) never reach dateparser.
+_MONTH = (r"(?:jan(?:uary)?|feb(?:ruary)?|mar(?:ch)?|apr(?:il)?|(?-i:May|MAY)|june?|july?|aug(?:ust)?"
+          r"|sep(?:t(?:ember)?)?|oct(?:ober)?|nov(?:ember)?|dec(?:ember)?)\.?")
+_DAY = r"\d{1,2}(?:st|nd|rd|th)?"
+
+date_candidate_pattern = re.compile(
+    r"(?<![\d.])\b(?:"
+    # ISO: 2024-11-02, 2024-11-02T11:59:59
+    r"\d{4}-\d{1,2}-\d{1,2}(?:[T ]\d{1,2}:\d{2}(?::\d{2})?)?"
+    # Numeric: 11/02/2024, 11-02-24 (month first) and 02.11.2024 (day first; dotted dates need a
+    # 4-digit year, so clause numbers such as 12.3.14 are not dates)
+    r"|\d{1,2}(?P<separator>[/-])\d{1,2}(?P=separator)(?:\d{4}|\d{2})"
+    r"|(?P<dotted>\d{1,2}\.\d{1,2}\.\d{4})"
+    # Month name: November 2, 2024 / Nov. 2nd / 2 November 2024 / 2nd of November / November 2024
+    rf"|{_MONTH}\s+{_DAY}(?:,?\s+\d{{4}})?"
+    rf"|{_DAY}\s+(?:of\s+)?{_MONTH}(?:,?\s+\d{{4}})?"
+    rf"|{_MONTH},?\s+\d{{4}}"
+    r")(?!\w|\.\d)",
+    re.IGNORECASE,
+)
+# Numbers right after these words are references to parts of a document, not dates
+section_reference_pattern = re.compile(r"(?:§|\b(?:section|sec|clause|article|art|paragraph|para|schedule|exhibit|rule|no)\.?)\s*$",
+                                       re.IGNORECASE)
+
+DATEPARSER_LANGUAGES = ["en"]
+DATEPARSER_SETTINGS = {
+    "DATE_ORDER": "MDY",
+    "PREFER_DAY_OF_MONTH": "first",
+    "RETURN_AS_TIMEZONE_AWARE": False,
+}
+
+# A date found in a document: the parsed datetime, the matched text, its character offset and its 1-based line
+DateMatch = namedtuple("DateMatch", ["date", "text", "offset", "line"])
+
+@lru_cache(maxsize=8192)
+def parse_date(date_text, date_order=DATEPARSER_SETTINGS["DATE_ORDER"]):
+    """Parses one candidate date string. Results are memoized, since the same dates recur across documents."""
+    settings = dict(DATEPARSER_SETTINGS, DATE_ORDER=date_order)
+    return dateparser.parse(date_text, languages=DATEPARSER_LANGUAGES, settings=settings)
+
+def extract_dates(text):
+    """Returns a DateMatch for every date in the text, in order of appearance."""
+    line_starts = [0] + [match.end() for match in re.finditer(r"\n", text)]
     dates = []
-    amounts = []
-    
-    # Extract dates using dateparser
-    for line in text.splitlines():
-        parsed_date = dateparser.parse(line)
+    for match in date_candidate_pattern.finditer(text):
+        if match.group()[0].isdigit() and section_reference_pattern.search(text[max(0, match.start() - 16):match.start()]):
+            continue
+        date_text = " ".join(match.group().split())
+        # Dotted numeric dates are written day first by convention
+        parsed_date = parse_date(date_text, "DMY") if match.group("dotted") else parse_date(date_text)
         if parsed_date:
-            dates.append(parsed_date)
-
-    # Use regex to find monetary values
-    amount_pattern = r'[\$\£\€]?\s?\d+(?:,\d{3})*(?:\.\d{2})?\s?(USD|GBP|EUR)?'
-    amounts.extend(re.findall(amount_pattern, text))
-    
-    return dates, amounts
+            line = bisect_right(line_starts, match.start())
+            dates.append(DateMatch(parsed_date, match.group(), match.start(), line))
+    return dates
+
+# Regex for monetary values
+# A number counts as an amount only with a currency symbol before it or a currency code before or after it.
+amount_pattern = re.compile(
+    r"(?:(?P<symbol>[\$\£\€])\s?|\b(?P<prefix>USD|GBP|EUR)\s?)?"
+    r"(?<![\d.,])(?P<number>\d{1,3}(?:,\d{3})+(?:\.\d+)?|\d+(?:\.\d+)?)(?!\d|[.,]\d)"
+    r"(?:\s?(?P<scale>(?i:thousand|million|billion))\b|(?P<short_scale>(?i:k|m|mm|bn))\b)?"
+    r"(?:\s?(?P<suffix>USD|GBP|EUR)\b)?"
+)
+CURRENCY_SYMBOLS = {"$": "USD", "£": "GBP", "€": "EUR"}
+AMOUNT_SCALES = {"thousand": 1e3, "k": 1e3, "million": 1e6, "m": 1e6, "mm": 1e6, "billion": 1e9, "bn": 1e9}
+
+# A monetary amount found in a document: its numeric value, currency code, matched text, character offset and 1-based line
+AmountMatch = namedtuple("AmountMatch", ["value", "currency", "text", "offset", "line"])
+
+def extract_amounts(text):
+    """Returns an AmountMatch for every monetary amount in the text, in order of appearance."""
+    line_starts = [0] + [match.end() for match in re.finditer(r"\n", text)]
+    amounts = []
+    for match in amount_pattern.finditer(text):
+        currency = match.group("prefix") or match.group("suffix") or CURRENCY_SYMBOLS.get(match.group("symbol"))
+        if currency:
+            value = float(match.group("number").replace(",", ""))
+            scale = match.group("scale") or match.group("short_scale")
+            if scale:
+                value *= AMOUNT_SCALES[scale.lower()]
+            line = bisect_right(line_starts, match.start())
+            amounts.append(AmountMatch(value, currency, " ".join(match.group().split()), match.start(), line))
+    return amounts
 
 # Function for OCR on image-based PDFs
 def ocr_image(image):
     """Extracts text from an image using OCR."""
     return pytesseract.image_to_string(image)
 
+# Word Clouds
+# Word clouds are rendered off-screen to PNG files on a small process pool while the analysis
+# goes on, then inserted into the report under each file's heading.
+WORDCLOUDS_ENABLED = True  # False skips word clouds entirely for throughput runs
+WORDCLOUD_WIDTH = 800  # Image size in pixels
+WORDCLOUD_HEIGHT = 400
+WORDCLOUD_REPORT_WIDTH = 6.0  # Width of the image in the report, in inches
+WORDCLOUD_WORKERS = 2
+
 # Function to generate a word cloud from found keywords
-def generate_wordcloud(found_keywords):
-    if found_keywords:
-        wordcloud = WordCloud(width=800, height=400, background_color='white').generate_from_frequencies(found_keywords)
-        plt.figure(figsize=(10, 5))
+def generate_wordcloud(found_keywords, image_path, width=WORDCLOUD_WIDTH, height=WORDCLOUD_HEIGHT):
+    """Renders a word cloud of the found keywords to a PNG file and returns its path."""
+    wordcloud = WordCloud(width=width, height=height, background_color='white').generate_from_frequencies(found_keywords)
+    fig = plt.figure(figsize=(width / 100, height / 100), dpi=100)
+    try:
         plt.imshow(wordcloud, interpolation='bilinear')
         plt.axis("off")
-        plt.show()
+        fig.savefig(image_path, bbox_inches="tight")
+    finally:
+        # Close the figure right away so figures do not pile up over a long run
+        plt.close(fig)
+    return image_path
+
+def start_wordcloud_pool(enabled=WORDCLOUDS_ENABLED, workers=WORDCLOUD_WORKERS):
+    """Returns the process pool that renders word clouds, or None when word clouds are disabled."""
+    if not enabled:
+        return None
+    return ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn"))
+
+def wordcloud_image_path(image_dir, file_path):
+    """Returns the PNG path used for a file's word cloud."""
+    digest = hashlib.sha1(os.path.abspath(file_path).encode("utf-8")).hexdigest()[:12]
+    return os.path.join(image_dir, f"{os.path.splitext(os.path.basename(file_path))[0]}_{digest}.png")
+
+def submit_wordcloud(pool, found_keywords, image_path, width=WORDCLOUD_WIDTH, height=WORDCLOUD_HEIGHT):
+    """Starts rendering a word cloud; returns a future of its path, or None if there is nothing to render."""
+    if pool is None or not found_keywords:
+        return None
+    return pool.submit(generate_wordcloud, found_keywords, image_path, width, height)
+
+def wordcloud_result(future):
+    """Waits for a word cloud and returns its image path, or None if it was not rendered."""
+    if future is None:
+        return None
+    try:
+        return future.result()
+    except Exception as e:
+        print("Word cloud error:", e)
+        return None
 
 # Dynamic Summarization Function
-def dynamic_summarization(text):
-    """Adjusts max_length and min_length based on the input text length for summarization."""
+def summary_lengths(text):
+    """Returns the (max_length, min_length) tier used to summarize a text of this length."""
     input_length = len(text.split())
 
     # Set max and min length dynamically based on input length
     if input_length < 20:
-        max_length = 5
-        min_length = 3
+        return 5, 3
     elif input_length < 50:
-        max_length = 10
-        min_length = 5
+        return 10, 5
     else:
-        max_length = 50
-        min_length = 25
+        return 50, 25
+
+def dynamic_summarization(text, backend=None):
+    """Adjusts max_length and min_length based on the input text length for summarization.
+
+    backend is a name from SUMMARIZER_BACKENDS or a SummarizerBackend; the default is SUMMARIZER_BACKEND.
+    """
+    max_length, min_length = summary_lengths(text)
 
     try:
-        summarized_text = summarizer(text, max_length=max_length, min_length=min_length, do_sample=False)
+        summarized_text = get_summarizer(backend)(text, max_length=max_length, min_length=min_length, do_sample=False)
         return summarized_text[0]['summary_text']
     except Exception as e:
         print("Summarization error:", e)
         return "Summary could not be generated."
 
+# Batched Summarization
+# Texts from many documents are grouped by their length tier, and each tier is summarized with
+# one batched summarizer call instead of one forward pass per document.
+SUMMARY_BATCH_SIZE = 8
+
+def batch_summarization(texts, batch_size=SUMMARY_BATCH_SIZE, backend=None):
+    """Summarizes a list of texts with a summarization backend and returns the summaries in the same order."""
+    summarizer = get_summarizer(backend)
+    if summarizer is None:
+        return ["Summary could not be generated."] * len(texts)
+
+    buckets = {}
+    for index, text in enumerate(texts):
+        buckets.setdefault(summary_lengths(text), []).append(index)
+
+    summaries = [None] * len(texts)
+    for (max_length, min_length), indexes in buckets.items():
+        # Similar lengths side by side keep padding inside each batch small
+        indexes.sort(key=lambda index: len(texts[index]))
+        try:
+            outputs = summarizer([texts[index] for index in indexes], max_length=max_length,
+                                 min_length=min_length, do_sample=False, batch_size=batch_size)
+            for index, output in zip(indexes, outputs):
+                summaries[index] = output['summary_text']
+        except Exception as e:
+            # Retry one by one so a single bad input does not cost the whole bucket its summaries
+            print("Batched summarization error:", e)
+            for index in indexes:
+                summaries[index] = dynamic_summarization(texts[index], backend)
+    return summaries
+
 # Document Processing Functions
 
-# Process Word documents (.docx)
+# Word text extraction
+# The .docx zip is read directly: the headers, the body and the footers are streamed through an
+# incremental XML parser, and every finished element is dropped from the tree at once, so memory
+# stays flat however long the document is. Each paragraph becomes a line. Each table row becomes
+# a line with its cells separated by tabs. Lines come in document order, grouped into chunks.
+DOCX_CHUNK_CHARS = 100_000  # Approximate size of each text chunk handed to analysis
+
+_W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+_MC_FALLBACK = "{http://schemas.openxmlformats.org/markup-compatibility/2006}Fallback"
+_RELATIONSHIP = "{http://schemas.openxmlformats.org/package/2006/relationships}Relationship"
+
+def docx_relationships(docx, part_name):
+    """Returns (type, target part name) for the internal relationships of a part of a .docx, in file order.
+
+    The type is the last segment of the relationship type URI, e.g. "officeDocument" or "header".
+    An empty part_name gives the relationships of the package itself."""
+    directory, name = posixpath.split(part_name)
+    try:
+        rels = ElementTree.fromstring(docx.read(posixpath.join(directory, "_rels", name + ".rels")))
+    except KeyError:
+        return []
+    relationships = []
+    for relationship in rels.iter(_RELATIONSHIP):
+        if relationship.get("TargetMode") == "External":
+            continue
+        target = relationship.get("Target", "")
+        # Targets are relative to the source part's directory unless they start at the package root
+        target = target[1:] if target.startswith("/") else posixpath.normpath(posixpath.join(directory, target))
+        relationships.append((relationship.get("Type", "").rsplit("/", 1)[-1], target))
+    return relationships
+
+def docx_text_parts(docx):
+    """Returns the XML parts of a .docx that hold its text: headers, the body, then footers.
+
+    The body is the package's officeDocument part, and only the headers and footers it references are read."""
+    documents = [target for rel_type, target in docx_relationships(docx, "") if rel_type == "officeDocument"]
+    if not documents:
+        raise ValueError("Not a Word document: the package has no main document part")
+    document = documents[0]
+    names = set(docx.namelist())
+    parts = {"header": [], "footer": []}
+    for rel_type, target in docx_relationships(docx, document):
+        if rel_type in parts and target in names and target not in parts[rel_type]:
+            parts[rel_type].append(target)
+    return parts["header"] + [document] + parts["footer"]
+
+def iter_docx_part_lines(part):
+    """Yields the lines of text of one WordprocessingML part, in document order."""
+    paragraphs = []  # Text runs of the open paragraphs (text boxes nest paragraphs)
+    rows = []  # Cells of the open table rows (tables can nest)
+    cells = []  # Lines of the open table cells
+    containers = []  # The open paragraphs and cells, innermost last, which take the lines finished inside them
+    elements = []  # Open elements, so finished ones can be removed from their parent
+    skip_depth = 0  # Inside mc:Fallback, which repeats the content of mc:Choice
+
+    for event, element in ElementTree.iterparse(part, events=("start", "end")):
+        tag = element.tag
+        if event == "start":
+            elements.append(element)
+            if skip_depth or tag == _MC_FALLBACK:
+                skip_depth += 1
+            elif tag == _W + "p":
+                paragraphs.append([])
+                containers.append(paragraphs[-1])
+            elif tag == _W + "tr":
+                rows.append([])
+            elif tag == _W + "tc":
+                cells.append([])
+                containers.append(cells[-1])
+            continue
+
+        elements.pop()
+        if elements:
+            elements[-1].remove(element)
+        if skip_depth:
+            skip_depth -= 1
+            continue
+
+        line = None
+        if tag == _W + "t":
+            if paragraphs and element.text:
+                paragraphs[-1].append(element.text)
+        elif tag == _W + "tab":
+            if paragraphs:
+                paragraphs[-1].append("\t")
+        elif tag in (_W + "br", _W + "cr"):
+            if paragraphs:
+                paragraphs[-1].append("\n")
+        elif tag == _W + "p":
+            line = "".join(paragraphs.pop()).strip()
+            containers.pop()
+        elif tag == _W + "tc":
+            cell_text = " ".join(cells.pop())
+            containers.pop()
+            if rows:
+                rows[-1].append(cell_text)
+        elif tag == _W + "tr":
+            line = "\t".join(rows.pop()).strip()
+
+        if line:
+            if not containers:
+                yield line
+            elif paragraphs and containers[-1] is paragraphs[-1]:
+                # A text box (or a table inside one) becomes part of the paragraph it is anchored in
+                text = paragraphs[-1]
+                if text and not text[-1][-1:].isspace():
+                    text.append(" ")
+                text.append(line + " ")
+            else:
+                # Paragraphs and nested tables inside a cell become part of the cell's text
+                containers[-1].append(line)
+
+def iter_word_doc_text(file_path, chunk_chars=DOCX_CHUNK_CHARS):
+    """Yields the text of a Word document (headers, paragraphs, tables and footers) in chunks of whole lines."""
+    with zipfile.ZipFile(file_path) as docx:
+        for part_name in docx_text_parts(docx):
+            lines = []
+            chunk_size = 0
+            with docx.open(part_name) as part:
+                for line in iter_docx_part_lines(part):
+                    lines.append(line)
+                    chunk_size += len(line) + 1
+                    if chunk_size >= chunk_chars:
+                        yield "\n".join(lines)
+                        lines = []
+                        chunk_size = 0
+            if lines:
+                yield "\n".join(lines)
+
+# Function to analyze a document that arrives as a sequence of text chunks
+def analyze_chunks(chunks, keywords_and_entities=True, ner_chunks=None):
+    """Runs date and amount extraction, keyword matching and NER over a document's text chunks.
+
+    Returns a dict with "keywords" and "entities" counts, "dates" (DateMatch) and "amounts" (AmountMatch),
+    with offsets and lines counted as if the chunks were joined by newlines, and "timings" in seconds per stage.
+    Chunks are sent to NER NER_BATCH_SIZE at a time, so only that many are held in memory.
+    With keywords_and_entities=False only dates and amounts are extracted. With a ner_chunks list, the
+    chunks are appended to it instead of going through NER, so the caller can batch them with the
+    chunks of other documents.
+    """
+    matcher = get_keyword_matcher(get_expanded_keywords())
+    timings = {"extraction": 0.0, "dates_amounts": 0.0, "keywords": 0.0, "entities": 0.0}
+    analysis = {"keywords": {}, "entities": {}, "dates": [], "amounts": [], "timings": timings}
+    pending = []
+    offset = 0
+    line = 0
+
+    def add_counts(counts, totals):
+        for word, count in counts.items():
+            totals[word] = totals.get(word, 0) + count
+
+    def run_ner():
+        start = time.perf_counter()
+        for entity_counts in extract_entities_batch(pending):
+            add_counts(entity_counts, analysis["entities"])
+        timings["entities"] += time.perf_counter() - start
+        pending.clear()
+
+    chunks = iter(chunks)
+    while True:
+        start = time.perf_counter()
+        chunk = next(chunks, None)
+        timings["extraction"] += time.perf_counter() - start
+        if chunk is None:
+            break
+
+        start = time.perf_counter()
+        for date_match in extract_dates(chunk):
+            analysis["dates"].append(date_match._replace(offset=date_match.offset + offset, line=date_match.line + line))
+        for amount_match in extract_amounts(chunk):
+            analysis["amounts"].append(amount_match._replace(offset=amount_match.offset + offset, line=amount_match.line + line))
+        timings["dates_amounts"] += time.perf_counter() - start
+
+        if keywords_and_entities:
+            start = time.perf_counter()
+            add_counts(matcher.count(chunk), analysis["keywords"])
+            timings["keywords"] += time.perf_counter() - start
+
+            if ner_chunks is not None:
+                ner_chunks.append(chunk)
+            else:
+                pending.append(chunk)
+                if len(pending) >= NER_BATCH_SIZE:
+                    run_ner()
+        offset += len(chunk) + 1
+        line += chunk.count("\n") + 1
+    if pending:
+        run_ner()
+    return analysis
+
+def merge_found_keywords(keywords, entities):
+    """Combines keyword and entity counts into the single found_keywords dict used by the report."""
+    found_keywords = dict(keywords)
+    for entity, count in entities.items():
+        found_keywords[entity] = found_keywords.get(entity, 0) + count
+    return found_keywords
+
+# Excel streaming
+# Workbooks are opened read-only and read row by row as plain values, without building the
+# styled object model. Rows become lines and every sheet starts a new chunk, so cells of
+# neighbouring rows never run together into one token.
+EXCEL_CHUNK_CHARS = 100_000  # Approximate size of each text chunk handed to analysis
+EXCEL_MAX_ROWS = None  # Optional cap on the rows read from one workbook
+EXCEL_MAX_BYTES = None  # Optional cap on the UTF-8 text read from one workbook
+
+def iter_excel_chunks(file_path, chunk_chars=EXCEL_CHUNK_CHARS, max_rows=EXCEL_MAX_ROWS, max_bytes=EXCEL_MAX_BYTES):
+    """Yields the text of a workbook in chunks of whole rows, stopping early at the row or byte cap."""
+    workbook = load_workbook(file_path, read_only=True, data_only=True)
+    rows_read = 0
+    bytes_read = 0
+    try:
+        for worksheet in workbook.worksheets:
+            lines = []
+            chunk_size = 0
+            for row in worksheet.iter_rows(values_only=True):
+                line = " ".join(str(cell) for cell in row if cell)
+                rows_read += 1
+                bytes_read += len(line.encode("utf-8")) + 1
+                if (max_rows is not None and rows_read > max_rows) or (max_bytes is not None and bytes_read > max_bytes):
+                    print(f"Stopped reading {os.path.basename(file_path)} at the Excel row/byte cap")
+                    if lines:
+                        yield "\n".join(lines)
+                    return
+                if not line:
+                    continue
+                lines.append(line)
+                chunk_size += len(line) + 1
+                if chunk_size >= chunk_chars:
+                    yield "\n".join(lines)
+                    lines = []
+                    chunk_size = 0
+            if lines:
+                yield "\n".join(lines)
+    finally:
+        workbook.close()
+
+# PDF page streaming
+# Pages are read one at a time. A page without a text layer is rendered on its own and OCR'd on a
+# small thread pool, so only a few page images are ever held in memory, whatever the page count.
+PDF_OCR_DPI = 200  # Rendering resolution for OCR
+PDF_OCR_WORKERS = 2  # Scanned pages OCR'd at the same time
+
+def ocr_pdf_page(file_path, page_number, dpi=PDF_OCR_DPI):
+    """Renders a single PDF page (1-based) and returns its OCR text."""
+    images = convert_from_path(file_path, dpi=dpi, first_page=page_number, last_page=page_number)
+    try:
+        return " ".join(ocr_image(image) for image in images)
+    finally:
+        for image in images:
+            image.close()
+
+def iter_pdf_pages(file_path, dpi=PDF_OCR_DPI, ocr_workers=PDF_OCR_WORKERS):
+    """Yields the text of each page of a PDF in page order, using OCR for pages with no text layer."""
+    with pdfplumber.open(file_path) as pdf, ThreadPoolExecutor(ocr_workers) as executor:
+        queued = deque()  # Page texts and pending OCR futures, in page order
+        ocr_jobs = 0
+        for page_number, page in enumerate(pdf.pages, start=1):
+            # Use pdfplumber for improved text extraction
+            page_text = page.extract_text()
+            page.flush_cache()
+            if page_text and page_text.strip():
+                queued.append(page_text)
+            else:
+                queued.append(executor.submit(ocr_pdf_page, file_path, page_number, dpi))
+                ocr_jobs += 1
+
+            # Hand back finished pages; block on the oldest OCR job once every worker is busy
+            while queued and (isinstance(queued[0], str) or queued[0].done() or ocr_jobs > ocr_workers):
+                item = queued.popleft()
+                if isinstance(item, str):
+                    yield item
+                else:
+                    ocr_jobs -= 1
+                    yield item.result()
+
+        for item in queued:
+            yield item if isinstance(item, str) else item.result()
+
+# Text extractor for each supported file extension
+TEXT_EXTRACTORS = {
+    ".docx": iter_word_doc_text,
+    ".xlsx": iter_excel_chunks,
+    ".pdf": iter_pdf_pages,
+}
+
+def analyze_document(file_path):
+    """Analyzes one file and returns its result record.
+
+    The record is JSON-ready: the file's absolute path, keyword and entity counts, dates and monetary
+    amounts (values and currencies) with their offsets and lines, and per-stage timings. The summary
+    is filled in later by summarize_records so that summarization can be batched across documents.
+    """
+    return analysis_record(file_path, analyze_chunks(TEXT_EXTRACTORS[os.path.splitext(file_path)[1]](file_path)))
+
+def analysis_record(file_path, analysis):
+    """Builds the JSON-ready result record of a file from the output of analyze_chunks."""
+    return {
+        "file": os.path.abspath(file_path),
+        "keywords": analysis["keywords"],
+        "entities": analysis["entities"],
+        "dates": [{"date": date_match.date.isoformat(), "text": date_match.text,
+                   "offset": date_match.offset, "line": date_match.line} for date_match in analysis["dates"]],
+        "amounts": [{"value": amount_match.value, "currency": amount_match.currency, "text": amount_match.text,
+                     "offset": amount_match.offset, "line": amount_match.line} for amount_match in analysis["amounts"]],
+        "summary": None,
+        "timings": {stage: round(seconds, 4) for stage, seconds in analysis["timings"].items()},
+    }
+
+# Compatibility wrappers
+# The pipeline no longer calls these: files go through TEXT_EXTRACTORS and analyze_document_group.
+# They are kept, as thin wrappers over the streaming analysis, for scripts that imported them.
+def analyze_text_with_nlp(text, keywords):
+    """Returns the keyword and named entity counts of a text."""
+    found_keywords = get_keyword_matcher(keywords).count(text)
+    return merge_found_keywords(found_keywords, extract_entities_batch([text])[0])
+
+def extract_info(text):
+    """Returns the dates (datetimes) and monetary amounts (matched text) of a text."""
+    return ([date_match.date for date_match in extract_dates(text)],
+            [amount_match.text for amount_match in extract_amounts(text)])
+
+def analyze_text_chunks(chunks):
+    """Analyzes a document's text chunks and returns (found_keywords, dates, amounts)."""
+    analysis = analyze_chunks(chunks)
+    found_keywords = merge_found_keywords(analysis["keywords"], analysis["entities"])
+    return (found_keywords, [date_match.date for date_match in analysis["dates"]],
+            [amount_match.text for amount_match in analysis["amounts"]])
+
 def process_word_doc(file_path):
-    doc = WordDocument(file_path)
-    text = " ".join([paragraph.text for paragraph in doc.paragraphs])
-    dates, amounts = extract_info(text)
-    print(f"Extracted Dates: {dates}")
-    print(f"Extracted Monetary Amounts: {amounts}")
-    return analyze_text_with_nlp(text, expanded_keywords), dates, amounts
-
-# Process Excel files (.xlsx)
+    return analyze_text_chunks(iter_word_doc_text(file_path))
+
 def process_excel(file_path):
-    workbook = load_workbook(file_path)
-    text = ""
-    for sheet in workbook.sheetnames:
-        worksheet = workbook[sheet]
-        for row in worksheet.iter_rows(values_only=True):
-            text += " ".join(str(cell) for cell in row if cell)
-    dates, amounts = extract_info(text)
-    print(f"Extracted Dates: {dates}")
-    print(f"Extracted Monetary Amounts: {amounts}")
-    return analyze_text_with_nlp(text, expanded_keywords), dates, amounts
-
-# Process PDF files (.pdf)
+    return analyze_text_chunks(iter_excel_chunks(file_path))
+
 def process_pdf(file_path):
-    text = ""
-    # Use pdfplumber for improved text extraction
-    with pdfplumber.open(file_path) as pdf:
-        for page in pdf.pages:
-            page_text = page.extract_text()
-            if page_text:
-                text += page_text
-    
-    # If text extraction fails (indicating an image-based PDF), use OCR
-    if not text.strip():
-        images = convert_from_path(file_path)
-        text = " ".join(ocr_image(image) for image in images)
-    
-    dates, amounts = extract_info(text)
-    print(f"Extracted Dates: {dates}")
-    print(f"Extracted Monetary Amounts: {amounts}")
-    return analyze_text_with_nlp(text, expanded_keywords), dates, amounts
+    return analyze_text_chunks(iter_pdf_pages(file_path))
+
+# Small files are analyzed in groups, so that NER batches the chunks of many files in one nlp.pipe
+# call instead of running a one-chunk batch per short memo.
+NER_GROUP_BYTES = 256 * 1024  # Files up to this size are grouped
+NER_GROUP_FILES = 16  # Files per group
+
+def group_small_jobs(jobs, is_small):
+    """Splits jobs into tuples: runs of up to NER_GROUP_FILES consecutive small jobs, and each other job alone."""
+    groups, group = [], []
+    for job in jobs:
+        if not is_small(job):
+            if group:
+                groups.append(tuple(group))
+                group = []
+            groups.append((job,))
+            continue
+        group.append(job)
+        if len(group) >= NER_GROUP_FILES:
+            groups.append(tuple(group))
+            group = []
+    if group:
+        groups.append(tuple(group))
+    return groups
+
+def is_small_file(file_path):
+    # A small PDF can still be a scan that takes minutes to OCR, so PDFs are only grouped once their text is extracted
+    if os.path.splitext(file_path)[1] == ".pdf":
+        return False
+    try:
+        return os.path.getsize(file_path) <= NER_GROUP_BYTES
+    except OSError:
+        return False  # Analyzed alone, where the error is reported
+
+def analyze_document_group(file_paths, text_dir=None):
+    """Pool task: analyzes several files and returns a (record, error) pair for each, in order.
+
+    Dates, amounts and keywords are found file by file; then the chunks of all the files go through
+    NER together. With text_dir, the text saved by extract_document is read instead of the files.
+    """
+    analyses = []
+    ner_chunks = []
+    owners = []  # Index of the file each NER chunk belongs to
+    for file_path in file_paths:
+        chunk_count = len(ner_chunks)
+        try:
+            if text_dir:
+                chunks = iter_extracted_text(extracted_text_path(text_dir, file_path))
+            else:
+                chunks = TEXT_EXTRACTORS[os.path.splitext(file_path)[1]](file_path)
+            analyses.append((analyze_chunks(chunks, ner_chunks=ner_chunks), None))
+            owners.extend([len(analyses) - 1] * (len(ner_chunks) - chunk_count))
+        except Exception as e:
+            del ner_chunks[chunk_count:]
+            analyses.append((None, f"{type(e).__name__}: {e}"))
+
+    if ner_chunks:
+        start = time.perf_counter()
+        entity_counts = extract_entities_batch(ner_chunks)
+        seconds_per_chunk = (time.perf_counter() - start) / len(ner_chunks)
+        for owner, counts in zip(owners, entity_counts):
+            analysis = analyses[owner][0]
+            for entity, count in counts.items():
+                analysis["entities"][entity] = analysis["entities"].get(entity, 0) + count
+            analysis["timings"]["entities"] += seconds_per_chunk
+    return [(analysis_record(file_path, analysis), None) if analysis else (None, error)
+            for file_path, (analysis, error) in zip(file_paths, analyses)]
+
+def analyze_file_groups(groups, workers, timeout, task):
+    """Runs groups of jobs through analyze_files and yields (job, result, error) for every job in them.
+
+    task returns a (result, error) pair per job of a group. A group that fails as a whole, because its
+    worker crashed or it ran past the timeout, is run again one job at a time, so that only the job
+    at fault gets the error.
+    """
+    for group, results, group_error in analyze_files(groups, task, workers, timeout):
+        if not group_error:
+            for job, (result, error) in zip(group, results):
+                yield job, result, error
+        elif len(group) == 1:
+            yield group[0], None, group_error
+        else:
+            yield from analyze_file_groups([(job,) for job in group], workers, timeout, task)
+
+# Parallel folder analysis
+# Files are processed across a pool of worker processes. Each worker loads the spaCy model and the
+# keyword matcher once, and results come back to the parent in the order the files were given.
+PARALLEL_WORKERS = os.cpu_count() or 1  # 1 processes files one at a time in this process
+FILE_TIMEOUT = 600  # Seconds a single file may take before its entry is marked as failed
+
+def _init_worker():
+    """Process pool initializer: makes sure the spaCy model and keyword matcher are loaded once per worker."""
+    get_nlp()
+    get_keyword_matcher(get_expanded_keywords())
+
+def _stop_pool(executor):
+    """Shuts a process pool down without waiting, killing workers that are still busy."""
+    # ProcessPoolExecutor has no public way to kill a hung worker before Python 3.14
+    processes = list((getattr(executor, "_processes", None) or {}).values())
+    executor.shutdown(wait=False, cancel_futures=True)
+    for process in processes:
+        process.terminate()
+    for process in processes:
+        process.join()
+
+def analyze_files(file_paths, task, workers=PARALLEL_WORKERS, timeout=FILE_TIMEOUT):
+    """Processes files and yields (file_path, result, error) for each one, in the order given.
+
+    Each file (or other picklable job) is handed to task, a picklable function. A file that
+    raises, crashes its worker or runs longer than `timeout` seconds yields an error message
+    instead of a result, and the rest of the run carries on. With workers=1 files are
+    processed in this process and the timeout is not enforced.
+    """
+    if workers <= 1:
+        for file_path in file_paths:
+            try:
+                yield file_path, task(file_path), None
+            except Exception as e:
+                yield file_path, None, f"{type(e).__name__}: {e}"
+        return
+
+    remaining = list(file_paths)
+    finished = {}  # Results that are ready but not yet handed back
+    suspects = deque()  # Files that were in flight when a worker crashed
+    spawn = multiprocessing.get_context("spawn")  # Workers start clean instead of inheriting the GUI and model-loading threads
+    while remaining:
+        if suspects:
+            # Each file caught in a crash runs alone in a fresh worker, so a second crash is known to be its own
+            file_path = suspects.popleft()
+            executor = ProcessPoolExecutor(1, mp_context=spawn, initializer=_init_worker)
+            try:
+                finished[file_path] = (executor.submit(task, file_path).result(timeout), None)
+            except FuturesTimeoutError:
+                finished[file_path] = (None, f"Did not finish within {timeout} seconds")
+            except BrokenProcessPool:
+                finished[file_path] = (None, "The worker process crashed")
+            except Exception as e:
+                finished[file_path] = (None, f"{type(e).__name__}: {e}")
+            finally:
+                _stop_pool(executor)
+        else:
+            queue = deque(file_path for file_path in remaining if file_path not in finished)
+            pool_size = min(workers, len(queue))
+            executor = ProcessPoolExecutor(pool_size, mp_context=spawn, initializer=_init_worker)
+            futures = {}
+            try:
+                # Only a few files wait beyond the busy workers, so a crash leaves few files to retry
+                def submit_more():
+                    while queue and sum(not future.done() for future in futures.values()) < 2 * pool_size:
+                        file_path = queue.popleft()
+                        futures[file_path] = executor.submit(task, file_path)
+
+                submit_more()
+                while remaining:
+                    file_path = remaining[0]
+                    if file_path not in finished:
+                        try:
+                            finished[file_path] = (futures.pop(file_path).result(timeout), None)
+                        except FuturesTimeoutError:
+                            # The worker is hung, so the pool is replaced
+                            finished[file_path] = (None, f"Did not finish within {timeout} seconds")
+                            break
+                        except BrokenProcessPool:
+                            # A worker died; every file in flight is retried alone
+                            suspects.append(file_path)
+                            break
+                        except Exception as e:
+                            finished[file_path] = (None, f"{type(e).__name__}: {e}")
+                    remaining.pop(0)
+                    result, error = finished.pop(file_path)
+                    yield file_path, result, error
+                    submit_more()
+            except BrokenProcessPool:
+                pass  # submit raises once a worker has died; the files in flight are collected below
+            finally:
+                # Keep the results that completed; files caught in a crash are retried alone, the rest are submitted again
+                for file_path, future in futures.items():
+                    if not future.done() or future.cancelled():
+                        continue
+                    error = future.exception()
+                    if isinstance(error, BrokenProcessPool):
+                        suspects.append(file_path)
+                    elif error is None:
+                        finished[file_path] = (future.result(), None)
+                    else:
+                        finished[file_path] = (None, f"{type(error).__name__}: {error}")
+                _stop_pool(executor)
+
+        while remaining and remaining[0] in finished:
+            file_path = remaining.pop(0)
+            result, error = finished.pop(file_path)
+            yield file_path, result, error
+
+# Near-Duplicate Detection
+# Drafts of the same contract are analyzed once. The text of every new or changed file is first
+# extracted to a temporary file while a MinHash signature of its word shingles is computed. A
+# locality-sensitive hash (LSH) over the signatures finds the earlier document each file nearly
+# duplicates without comparing every pair. Only the first document of each cluster is fully
+# analyzed; its near-duplicates reuse that analysis, and by default only the sections that
+# differ from it are run through keyword matching and NER. Files go through in windows, so
+# records are handed on (and written by a headless run) while the rest of the folder waits.
+DEDUP_ENABLED = True
+DEDUP_WINDOW_FILES = 256  # Files extracted and clustered before their records are analyzed and yielded
+DEDUP_THRESHOLD = 0.8  # Estimated Jaccard similarity of word shingles above which files are near-duplicates
+DEDUP_ANALYZE_DIFFERENCES = True  # False copies the canonical analysis without looking at the differences
+SHINGLE_WORDS = 5
+MINHASH_PERMUTATIONS = 128
+LSH_RECALL = 0.95  # Minimum chance that two files exactly at the threshold share a bucket
+MINHASH_BLOCK_SIZE = 8192  # Shingles hashed at a time, to bound memory on large documents
+
+_MINHASH_PRIME = np.uint64((1 << 61) - 1)
+_minhash_random = np.random.default_rng(20241102)
+_MINHASH_A = _minhash_random.integers(1, 1 << 31, MINHASH_PERMUTATIONS, dtype=np.uint64)
+_MINHASH_B = _minhash_random.integers(0, 1 << 31, MINHASH_PERMUTATIONS, dtype=np.uint64)
+
+# Sections are sentences and lines; near-duplicates are compared section by section
+section_split_pattern = re.compile(r"(?<=[.!?])\s+|\n+")
+
+def shingle_hashes(text, shingle_words=SHINGLE_WORDS):
+    """Returns the set of 32-bit hashes of the overlapping word shingles of a text."""
+    words = re.findall(r"\w+", text.lower())
+    if len(words) <= shingle_words:
+        return {zlib.crc32(" ".join(words).encode("utf-8"))} if words else set()
+    return {zlib.crc32(" ".join(words[i:i + shingle_words]).encode("utf-8"))
+            for i in range(len(words) - shingle_words + 1)}
+
+def minhash_signature(hashes):
+    """Returns the MinHash signature of a set of shingle hashes, or None for an empty set."""
+    if not hashes:
+        return None
+    hashes = np.fromiter(hashes, dtype=np.uint64, count=len(hashes))
+    signature = np.full(MINHASH_PERMUTATIONS, _MINHASH_PRIME, dtype=np.uint64)
+    for start in range(0, len(hashes), MINHASH_BLOCK_SIZE):
+        block = hashes[start:start + MINHASH_BLOCK_SIZE]
+        permuted = (np.outer(block, _MINHASH_A) + _MINHASH_B) % _MINHASH_PRIME
+        np.minimum(signature, permuted.min(axis=0), out=signature)
+    return signature
+
+def lsh_bands(threshold):
+    """Returns the (bands, rows per band) that split the MinHash signature for a similarity threshold.
+
+    More rows per band mean fewer dissimilar candidates to compare, so this picks the most rows for
+    which files at the threshold still share a bucket with probability LSH_RECALL. Raises ValueError
+    for thresholds outside (0, 1] or too low for even one row per band."""
+    if not 0 < threshold <= 1:
+        raise ValueError(f"the similarity threshold must be above 0 and at most 1, not {threshold}")
+    for rows in range(MINHASH_PERMUTATIONS, 0, -1):
+        bands = MINHASH_PERMUTATIONS // rows
+        if 1 - (1 - threshold ** rows) ** bands >= LSH_RECALL:
+            return bands, rows
+    minimum = 1 - (1 - LSH_RECALL) ** (1 / MINHASH_PERMUTATIONS)
+    raise ValueError(f"the similarity threshold must be at least {minimum:.3f}, not {threshold}")
+
+class NearDuplicateIndex:
+    """MinHash LSH index that maps each document to an earlier near-duplicate, if there is one."""
+
+    def __init__(self, threshold=DEDUP_THRESHOLD):
+        self.threshold = threshold
+        bands, self.rows = lsh_bands(threshold)
+        self.buckets = [{} for _ in range(bands)]
+        self.signatures = {}
+
+    def find_or_add(self, key, signature):
+        """Returns (canonical key, similarity) of the most similar indexed document above the
+        threshold. Otherwise adds the document as a new canonical one and returns (None, 0.0)."""
+        if signature is None:
+            return None, 0.0
+        band_keys = [signature[band * self.rows:(band + 1) * self.rows].tobytes() for band in range(len(self.buckets))]
+        candidates = set()
+        for buckets, band_key in zip(self.buckets, band_keys):
+            candidates.update(buckets.get(band_key, ()))
+
+        best_key, best_similarity = None, 0.0
+        for candidate in candidates:
+            similarity = float(np.mean(self.signatures[candidate] == signature))
+            if similarity >= self.threshold and similarity > best_similarity:
+                best_key, best_similarity = candidate, similarity
+        if best_key is not None:
+            return best_key, best_similarity
+
+        # Only canonical documents are indexed, so every cluster keeps a single analyzed member
+        self.signatures[key] = signature
+        for buckets, band_key in zip(self.buckets, band_keys):
+            buckets.setdefault(band_key, []).append(key)
+        return None, 0.0
+
+def extracted_text_path(text_dir, file_path):
+    digest = hashlib.sha1(os.path.abspath(file_path).encode("utf-8")).hexdigest()[:16]
+    return os.path.join(text_dir, f"{digest}.jsonl")
+
+def iter_extracted_text(text_path):
+    """Yields the text chunks saved by extract_document."""
+    with open(text_path, encoding="utf-8") as f:
+        for line in f:
+            yield json.loads(line)
+
+def extract_document(text_dir, file_path):
+    """Pool task: saves a file's text chunks under text_dir and returns its MinHash signature and extraction time."""
+    start = time.perf_counter()
+    hashes = set()
+    with open(extracted_text_path(text_dir, file_path), "w", encoding="utf-8") as f:
+        for chunk in TEXT_EXTRACTORS[os.path.splitext(file_path)[1]](file_path):
+            f.write(json.dumps(chunk) + "\n")
+            hashes.update(shingle_hashes(chunk))
+    return {"signature": minhash_signature(hashes), "extraction": time.perf_counter() - start}
+
+def text_sections(text_path):
+    """Returns the whitespace-normalized sections of a saved text, with their counts."""
+    return Counter(" ".join(section.split()) for chunk in iter_extracted_text(text_path)
+                   for section in section_split_pattern.split(chunk) if section.strip())
+
+def analyze_document_differences(text_dir, canonical_path, file_path):
+    """Pool task: analyzes only the sections of a near-duplicate that differ from its canonical document.
+
+    Returns a partial record: keyword and entity counts of the added sections, the same counts of the
+    removed sections under "removed", and the dates and amounts of the whole file (regex only).
+    """
+    text_path = extracted_text_path(text_dir, file_path)
+    sections = text_sections(text_path)
+    canonical_sections = text_sections(extracted_text_path(text_dir, canonical_path))
+    added = list((sections - canonical_sections).elements())
+    removed = list((canonical_sections - sections).elements())
+
+    record = analysis_record(file_path, analyze_chunks(iter_extracted_text(text_path), keywords_and_entities=False))
+    added_analysis = analyze_chunks(["\n".join(added)] if added else [])
+    removed_analysis = analyze_chunks(["\n".join(removed)] if removed else [])
+    record["keywords"] = added_analysis["keywords"]
+    record["entities"] = added_analysis["entities"]
+    record["removed"] = {"keywords": removed_analysis["keywords"], "entities": removed_analysis["entities"]}
+    for stage in ("keywords", "entities"):
+        record["timings"][stage] = round(added_analysis["timings"][stage] + removed_analysis["timings"][stage], 4)
+    record["sections_analyzed"] = len(added) + len(removed)
+    return record
+
+def duplicate_record(canonical_record, file_path, similarity, differences=None):
+    """Builds the record of a near-duplicate from its canonical document's record.
+
+    differences is the partial record from analyze_document_differences; without it the canonical
+    analysis is copied as it is.
+    """
+    record = {key: value for key, value in canonical_record.items() if key not in ("name", "wordcloud", "summary")}
+    record.update(file=os.path.abspath(file_path), summary=None,
+                  duplicate_of=canonical_record["file"], similarity=round(similarity, 3))
+    if differences is None:
+        record["timings"] = {}
+        return record
+
+    for counts in ("keywords", "entities"):
+        merged = dict(canonical_record[counts])
+        for word, count in differences[counts].items():
+            merged[word] = merged.get(word, 0) + count
+        for word, count in differences["removed"][counts].items():
+            merged[word] = merged.get(word, 0) - count
+        record[counts] = {word: count for word, count in merged.items() if count > 0}
+    record.update(dates=differences["dates"], amounts=differences["amounts"], timings=differences["timings"],
+                  sections_analyzed=differences["sections_analyzed"])
+    return record
+
+def analyze_files_deduplicated(file_paths, workers=PARALLEL_WORKERS, timeout=FILE_TIMEOUT,
+                               threshold=DEDUP_THRESHOLD, analyze_differences=DEDUP_ANALYZE_DIFFERENCES):
+    """Like analyze_files, but near-duplicates reuse the analysis of the first file of their cluster.
+
+    Yields (file_path, record, error). Each near-duplicate comes after its canonical file and
+    carries "duplicate_of" and "similarity". Files are taken DEDUP_WINDOW_FILES at a time, and
+    the records of a window are all yielded before the next window is extracted.
+    """
+    with tempfile.TemporaryDirectory() as text_dir:
+        index = NearDuplicateIndex(threshold)
+        canonical_records = {}  # Every canonical file analyzed so far, since later windows can hold its near-duplicates
+        extracted_count = duplicate_count = 0
+        for window_start in range(0, len(file_paths), DEDUP_WINDOW_FILES):
+            window = file_paths[window_start:window_start + DEDUP_WINDOW_FILES]
+
+            # Text extraction and signatures, in parallel; clusters are formed in file order
+            extraction_times = {}
+            canonical_of = {}
+            duplicates = {}  # Near-duplicates waiting for a canonical file of this window, when copying
+            orphaned = []  # Near-duplicates whose canonical file could not be analyzed
+            for file_path, result, error in analyze_files(window, partial(extract_document, text_dir), workers, timeout):
+                if error:
+                    yield file_path, None, error
+                    continue
+                extraction_times[file_path] = result["extraction"]
+                canonical_path, similarity = index.find_or_add(file_path, result["signature"])
+                if canonical_path is None:
+                    continue
+                canonical_of[file_path] = (canonical_path, similarity)
+                if canonical_path not in extraction_times and canonical_path not in canonical_records:
+                    orphaned.append(file_path)  # Its canonical file failed in an earlier window
+                elif not analyze_differences:
+                    if canonical_path in canonical_records:
+                        duplicate = duplicate_record(canonical_records[canonical_path], file_path, similarity)
+                        duplicate["timings"]["extraction"] = round(extraction_times[file_path], 4)
+                        yield file_path, duplicate, None
+                    else:
+                        duplicates.setdefault(canonical_path, []).append(file_path)
+            extracted_count += len(extraction_times)
+            duplicate_count += len(canonical_of)
+
+            # Canonical files are analyzed in full, small ones in groups. Near-duplicates have only their
+            # differences analyzed, or copy the canonical analysis once it is done.
+            skipped = set(orphaned)
+            jobs = [(file_path, canonical_of.get(file_path, (None,))[0]) for file_path in extraction_times
+                    if file_path not in skipped and (analyze_differences or file_path not in canonical_of)]
+            is_small = lambda job: job[1] is None and is_small_file(extracted_text_path(text_dir, job[0]))
+            for (file_path, canonical_path), record, error in analyze_file_groups(
+                    group_small_jobs(jobs, is_small), workers, timeout, partial(_analyze_extracted, text_dir)):
+                if canonical_path is not None:
+                    if error or canonical_path not in canonical_records:
+                        orphaned.append(file_path)
+                        continue
+                    record = duplicate_record(canonical_records[canonical_path], file_path, canonical_of[file_path][1], record)
+                elif error:
+                    yield file_path, None, error
+                    orphaned.extend(duplicates.get(file_path, ()))  # Analyzed on their own instead
+                    continue
+                else:
+                    canonical_records[file_path] = record
+                record["timings"]["extraction"] = round(extraction_times[file_path], 4)
+                yield file_path, record, None
+
+                for duplicate_path in duplicates.get(file_path, ()):
+                    duplicate = duplicate_record(record, duplicate_path, canonical_of[duplicate_path][1])
+                    duplicate["timings"]["extraction"] = round(extraction_times[duplicate_path], 4)
+                    yield duplicate_path, duplicate, None
+
+            orphaned_jobs = [(file_path, None) for file_path in orphaned]
+            for (file_path, _), record, error in analyze_file_groups(
+                    group_small_jobs(orphaned_jobs, is_small), workers, timeout, partial(_analyze_extracted, text_dir)):
+                if record is not None:
+                    record["timings"]["extraction"] = round(extraction_times[file_path], 4)
+                yield file_path, record, error
+
+            # Only the text of canonical files can be needed again
+            for file_path in window:
+                if file_path not in canonical_records:
+                    try:
+                        os.remove(extracted_text_path(text_dir, file_path))
+                    except OSError:
+                        pass
+        print(f"Near-duplicates: {duplicate_count} of {extracted_count} files reuse another file's analysis")
+
+def _analyze_extracted(text_dir, group):
+    """Pool task: analyzes a group of (file_path, canonical_path) jobs from their saved text.
+
+    Jobs without a canonical path are analyzed in full, together; a near-duplicate job is always
+    alone in its group and has only its differences analyzed. Returns a (record, error) pair per job.
+    """
+    if group[0][1] is not None:
+        (file_path, canonical_path), = group
+        return [(analyze_document_differences(text_dir, canonical_path, file_path), None)]
+    return analyze_document_group([file_path for file_path, _ in group], text_dir)
+
+# Result Cache
+# Each file's analysis is stored on disk under the hash of its content and the pipeline version,
+# so re-running a folder only reprocesses files that are new or changed. The pipeline version
+# covers the keyword set, the spaCy model and the summarization backend; changing any of them
+# invalidates every entry.
+CACHE_DIR = os.path.join(os.path.expanduser("~"), ".document_analysis_cache")
+CACHE_MAX_BYTES = 512 * 1024 * 1024  # Least recently used entries are evicted beyond this size
+CACHE_FORMAT_VERSION = 7
+
+@lru_cache(maxsize=None)
+def pipeline_version(summarizer=None):
+    """Returns a short hash identifying the keyword set and models that produce an analysis."""
+    summarizer = summarizer_backend(summarizer)
+    pipeline_description = {
+        "format": CACHE_FORMAT_VERSION,
+        "keywords": sorted(get_expanded_keywords()),
+        "spacy_model": SPACY_MODEL,
+        "summarizer_model": summarizer.model,
+    }
+    if summarizer.quantize:
+        pipeline_description["summarizer_quantized"] = True
+    pipeline_description = json.dumps(pipeline_description)
+    return hashlib.sha256(pipeline_description.encode("utf-8")).hexdigest()[:16]
+
+def file_content_hash(file_path):
+    """Returns the SHA-256 hex digest of a file's content."""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def _cache_entry_path(content_hash, summarizer=None):
+    return os.path.join(CACHE_DIR, f"{content_hash}-{pipeline_version(summarizer)}.json")
+
+def load_cached_analysis(content_hash, summarizer=None):
+    """Returns the cached result record for a file content hash, or None on a cache miss."""
+    entry_path = _cache_entry_path(content_hash, summarizer)
+    try:
+        with open(entry_path, encoding="utf-8") as f:
+            entry = json.load(f)
+    except (OSError, ValueError):
+        return None
+    os.utime(entry_path)  # Mark as recently used for eviction
+    return entry
+
+# Record fields that describe the file or its relation to other files rather than its content
+CACHE_EXCLUDED_FIELDS = ("file", "name", "duplicate_of", "similarity", "sections_analyzed")
+
+def save_cached_analysis(content_hash, record, summarizer=None):
+    """Stores a summarized result record for a file content hash, without its file-specific fields."""
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    entry = {key: value for key, value in record.items() if key not in CACHE_EXCLUDED_FIELDS}
+    entry_path = _cache_entry_path(content_hash, summarizer)
+    with open(entry_path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(entry, f)
+    os.replace(entry_path + ".tmp", entry_path)
+
+def evict_cache(max_bytes=CACHE_MAX_BYTES):
+    """Removes the least recently used cache entries until the cache fits in max_bytes."""
+    if not os.path.isdir(CACHE_DIR):
+        return
+    entries = []
+    for entry in os.scandir(CACHE_DIR):
+        if entry.is_file():
+            stat = entry.stat()
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+    total_size = sum(size for _, size, _ in entries)
+    for _, size, entry_path in sorted(entries):
+        if total_size <= max_bytes:
+            break
+        os.remove(entry_path)
+        total_size -= size
+
+def clear_cache():
+    """Deletes every cached analysis and returns how many entries were removed."""
+    if not os.path.isdir(CACHE_DIR):
+        return 0
+    removed = 0
+    for entry in os.scandir(CACHE_DIR):
+        if entry.is_file():
+            os.remove(entry.path)
+            removed += 1
+    return removed
+
+# Summarization of result records
+# Records are summarized in the parent process while a background thread keeps collecting results
+# from the process pool, so the workers go on with the next files during summarization.
+RECORD_BUFFER_SIZE = 4 * SUMMARY_BATCH_SIZE  # Analyzed files summarized together before they are handed on
+
+def iter_ahead(iterable, max_ahead):
+    """Yields the items of iterable, which a background thread consumes up to max_ahead items ahead of the caller.
+
+    An exception raised by iterable is raised again here. When the caller stops early, the thread
+    closes iterable the next time it gets an item, so a generator driving a process pool shuts it down.
+    """
+    items = queue.Queue(max_ahead)
+    stopped = threading.Event()
+    end = object()
+
+    def put(item):
+        while not stopped.is_set():
+            try:
+                items.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def feed():
+        iterator = iter(iterable)
+        try:
+            for item in iterator:
+                if not put((item, None)):
+                    return
+            put((end, None))
+        except Exception as e:
+            put((end, e))
+        finally:
+            if hasattr(iterator, "close"):
+                iterator.close()
+
+    threading.Thread(target=feed, daemon=True).start()
+    try:
+        while True:
+            item, error = items.get()
+            if item is end:
+                if error is not None:
+                    raise error
+                return
+            yield item
+    finally:
+        stopped.set()
+
+def found_keywords_of(record):
+    """Returns the combined keyword and entity counts of a result record."""
+    return merge_found_keywords(record["keywords"], record["entities"])
+
+def summarize_records(records, summarizer=None):
+    """Adds a summary to every record with found keywords, using batched summarization with the given backend."""
+    to_summarize = [record for record in records if "error" not in record and found_keywords_of(record)]
+    if not to_summarize:
+        return
+    start = time.perf_counter()
+    texts = [" ".join(found_keywords_of(record).keys()) for record in to_summarize]
+    # Near-duplicates often share their keywords, so each distinct text is summarized once
+    unique_texts = list(dict.fromkeys(texts))
+    summaries = dict(zip(unique_texts, batch_summarization(unique_texts, backend=summarizer)))
+    seconds_per_record = round((time.perf_counter() - start) / len(to_summarize), 4)
+    for record, text in zip(to_summarize, texts):
+        record["summary"] = summaries[text]
+        record["timings"]["summary"] = seconds_per_record
+
+def analyze_documents(file_paths, cache_stats=None, workers=PARALLEL_WORKERS, timeout=FILE_TIMEOUT,
+                      deduplicate=DEDUP_ENABLED, dedup_threshold=DEDUP_THRESHOLD,
+                      analyze_differences=DEDUP_ANALYZE_DIFFERENCES, summarizer=None):
+    """Yields a finished, summarized result record for every file.
+
+    Unchanged files come straight from the result cache, first. The others are analyzed in the
+    process pool, which keeps working while earlier records are summarized RECORD_BUFFER_SIZE at
+    a time. They are cached and then yielded in the order of file_paths, except that
+    near-duplicates follow the file whose analysis they reuse. Cache hit and miss counts are
+    stored in cache_stats if it is given. summarizer picks the summarization backend,
+    SUMMARIZER_BACKEND by default.
+    """
+    content_hashes = {}
+    changed_paths = []
+    for file_path in file_paths:
+        try:
+            content_hash = file_content_hash(file_path)
+        except OSError:
+            changed_paths.append(file_path)  # Reported as an error by the analysis
+            continue
+        record = load_cached_analysis(content_hash, summarizer)
+        if record is not None:
+            yield {"file": os.path.abspath(file_path), **record}
+        else:
+            content_hashes[file_path] = content_hash
+            changed_paths.append(file_path)
+
+    cache_hits, cache_misses = len(file_paths) - len(changed_paths), len(changed_paths)
+    print(f"Result cache: {cache_hits} hits, {cache_misses} misses")
+    if cache_stats is not None:
+        cache_stats.update(hits=cache_hits, misses=cache_misses)
+
+    # New and changed files are processed in parallel
+    pending = []
+
+    def finish_pending():
+        summarize_records([record for _, record in pending], summarizer)
+        for file_path, record in pending:
+            # Near-duplicate records borrow most of their analysis from another file, so only full analyses are cached
+            if "error" not in record and "duplicate_of" not in record and file_path in content_hashes:
+                save_cached_analysis(content_hashes[file_path], record, summarizer)
+        finished = [record for _, record in pending]
+        pending.clear()
+        return finished
+
+    if deduplicate and len(changed_paths) > 1:
+        results = analyze_files_deduplicated(changed_paths, workers, timeout, dedup_threshold, analyze_differences)
+    else:
+        results = analyze_file_groups(group_small_jobs(changed_paths, is_small_file), workers, timeout, analyze_document_group)
+    for file_path, record, error in iter_ahead(results, RECORD_BUFFER_SIZE):
+        if error:
+            print(f"Error processing {os.path.basename(file_path)}: {error}")
+            record = {"file": os.path.abspath(file_path), "error": error}
+        pending.append((file_path, record))
+        if len(pending) >= RECORD_BUFFER_SIZE:
+            yield from finish_pending()
+    yield from finish_pending()
+    evict_cache()
+
+# Corpus Index
+# Every analyzed document's keyword and entity counts, dates and amounts (with their offsets and
+# lines) are written to a local SQLite database. Questions across the whole corpus, such as which
+# documents mention indemnity and a date in 2025, are then answered from the index alone.
+INDEX_PATH = os.path.join(os.path.expanduser("~"), ".document_analysis_index.sqlite3")
+INDEX_ENABLED = True
+
+INDEX_SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL UNIQUE,
+    name TEXT NOT NULL,
+    summary TEXT,
+    indexed_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS keywords (
+    document_id INTEGER NOT NULL REFERENCES documents(id) ON DELETE CASCADE,
+    term TEXT NOT NULL COLLATE NOCASE,
+    count INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS entities (
+    document_id INTEGER NOT NULL REFERENCES documents(id) ON DELETE CASCADE,
+    entity TEXT NOT NULL COLLATE NOCASE,
+    count INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS dates (
+    document_id INTEGER NOT NULL REFERENCES documents(id) ON DELETE CASCADE,
+    day TEXT NOT NULL,
+    date TEXT NOT NULL,
+    text TEXT NOT NULL,
+    offset INTEGER,
+    line INTEGER
+);
+CREATE TABLE IF NOT EXISTS amounts (
+    document_id INTEGER NOT NULL REFERENCES documents(id) ON DELETE CASCADE,
+    value REAL NOT NULL,
+    currency TEXT NOT NULL,
+    text TEXT NOT NULL,
+    offset INTEGER,
+    line INTEGER
+);
+CREATE INDEX IF NOT EXISTS keywords_term ON keywords(term, document_id);
+CREATE INDEX IF NOT EXISTS keywords_document ON keywords(document_id);
+CREATE INDEX IF NOT EXISTS entities_entity ON entities(entity, document_id);
+CREATE INDEX IF NOT EXISTS entities_document ON entities(document_id);
+CREATE INDEX IF NOT EXISTS dates_day ON dates(day, document_id);
+CREATE INDEX IF NOT EXISTS dates_document ON dates(document_id);
+CREATE INDEX IF NOT EXISTS amounts_value ON amounts(value, document_id);
+CREATE INDEX IF NOT EXISTS amounts_document ON amounts(document_id);
+"""
+
+def open_index(index_path=INDEX_PATH):
+    """Opens the corpus index, creating its tables on first use."""
+    connection = sqlite3.connect(index_path)
+    connection.row_factory = sqlite3.Row
+    connection.execute("PRAGMA foreign_keys = ON")
+    connection.execute("PRAGMA journal_mode = WAL")
+    connection.execute("PRAGMA synchronous = NORMAL")
+    connection.executescript(INDEX_SCHEMA)
+    return connection
+
+def index_record(connection, record, name=None):
+    """Replaces a document's entry in the corpus index with the contents of its result record.
+
+    A record with an error only removes the document's old entry.
+    """
+    with connection:
+        connection.execute("DELETE FROM documents WHERE path = ?", (record["file"],))
+        if "error" in record:
+            return
+        document_id = connection.execute(
+            "INSERT INTO documents (path, name, summary, indexed_at) VALUES (?, ?, ?, ?)",
+            (record["file"], name or record.get("name") or os.path.basename(record["file"]), record.get("summary"), time.time()),
+        ).lastrowid
+        connection.executemany("INSERT INTO keywords VALUES (?, ?, ?)",
+                               [(document_id, term, count) for term, count in record["keywords"].items()])
+        connection.executemany("INSERT INTO entities VALUES (?, ?, ?)",
+                               [(document_id, entity, count) for entity, count in record["entities"].items()])
+        connection.executemany("INSERT INTO dates VALUES (?, ?, ?, ?, ?, ?)",
+                               [(document_id, date["date"][:10], date["date"], date["text"], date["offset"], date["line"])
+                                for date in record["dates"]])
+        connection.executemany("INSERT INTO amounts VALUES (?, ?, ?, ?, ?, ?)",
+                               [(document_id, amount["value"], amount["currency"], amount["text"], amount["offset"], amount["line"])
+                                for amount in record["amounts"]])
+
+def query_index(connection, terms=(), entities=(), date_from=None, date_to=None,
+                amount_min=None, amount_max=None, currency=None, limit=None):
+    """Returns the indexed documents matching every given condition, in path order.
+
+    terms and entities must all occur in a document (case-insensitively). date_from and date_to
+    are inclusive ISO dates (YYYY-MM-DD), amount_min and amount_max inclusive values, optionally
+    in one currency. Each result is a dict with the document's "file" and "name", the counts of
+    the requested terms and entities, and the dates and amounts that fall inside the ranges.
+    """
+    conditions, parameters = [], []
+    for term in terms:
+        conditions.append("id IN (SELECT document_id FROM keywords WHERE term = ?)")
+        parameters.append(term)
+    for entity in entities:
+        conditions.append("id IN (SELECT document_id FROM entities WHERE entity = ?)")
+        parameters.append(entity)
+
+    date_condition, date_parameters = [], []
+    if date_from:
+        date_condition.append("day >= ?")
+        date_parameters.append(date_from)
+    if date_to:
+        date_condition.append("day <= ?")
+        date_parameters.append(date_to)
+    date_condition = " AND ".join(date_condition) or "1"
+    if date_parameters:
+        conditions.append(f"id IN (SELECT document_id FROM dates WHERE {date_condition})")
+        parameters.extend(date_parameters)
+
+    amount_condition, amount_parameters = [], []
+    if amount_min is not None:
+        amount_condition.append("value >= ?")
+        amount_parameters.append(amount_min)
+    if amount_max is not None:
+        amount_condition.append("value <= ?")
+        amount_parameters.append(amount_max)
+    if currency:
+        amount_condition.append("currency = ?")
+        amount_parameters.append(currency.upper())
+    amount_condition = " AND ".join(amount_condition) or "1"
+    if amount_parameters:
+        conditions.append(f"id IN (SELECT document_id FROM amounts WHERE {amount_condition})")
+        parameters.extend(amount_parameters)
+
+    sql = "SELECT id, path, name FROM documents"
+    if conditions:
+        sql += " WHERE " + " AND ".join(conditions)
+    sql += " ORDER BY path"
+    if limit:
+        sql += f" LIMIT {int(limit)}"
+
+    results = []
+    for document in connection.execute(sql, parameters).fetchall():
+        document_id = document["id"]
+        result = {"file": document["path"], "name": document["name"]}
+        if terms:
+            result["keywords"] = {row["term"]: row["count"] for row in connection.execute(
+                f"SELECT term, count FROM keywords WHERE document_id = ? AND term IN ({', '.join('?' * len(terms))})",
+                [document_id, *terms])}
+        if entities:
+            result["entities"] = {row["entity"]: row["count"] for row in connection.execute(
+                f"SELECT entity, count FROM entities WHERE document_id = ? AND entity IN ({', '.join('?' * len(entities))})",
+                [document_id, *entities])}
+        if date_parameters:
+            result["dates"] = [dict(row) for row in connection.execute(
+                f"SELECT date, text, offset, line FROM dates WHERE document_id = ? AND {date_condition} ORDER BY offset",
+                [document_id, *date_parameters])]
+        if amount_parameters:
+            result["amounts"] = [dict(row) for row in connection.execute(
+                f"SELECT value, currency, text, offset, line FROM amounts WHERE document_id = ? AND {amount_condition} ORDER BY offset",
+                [document_id, *amount_parameters])]
+        results.append(result)
+    return results
+
+REPORT_FILENAME = "Enhanced_Files_Analysis_Report.docx"
+
+# Function to add one file's analysis to the report
+def add_analysis_to_report(report, filename, record, wordcloud_path=None):
+    if "error" in record:
+        report.add_paragraph(f"Could not analyze {filename}: {record['error']}")
+        return
+
+    found_words = found_keywords_of(record)
+    # Add analysis to report if keywords are found
+    if found_words:
+        report.add_heading(f"Analysis for {filename}", level=1)
+        if record.get("duplicate_of"):
+            reuse = "differing sections analyzed" if "sections_analyzed" in record else "analysis reused"
+            report.add_paragraph(f"Near-duplicate of {os.path.basename(record['duplicate_of'])} "
+                                 f"({record['similarity']:.0%} similar, {reuse})")
+        for word, count in found_words.items():
+            report.add_paragraph(f"{word}: {count} occurrences")
+
+        # Add extracted dates and monetary amounts
+        if record["dates"]:
+            report.add_paragraph("Dates: " + ", ".join(str(datetime.fromisoformat(date["date"])) for date in record["dates"]))
+        if record["amounts"]:
+            report.add_paragraph("Monetary Amounts: " + ", ".join(amount["text"] for amount in record["amounts"]))
+
+        report.add_paragraph("Summary: " + record["summary"])
+
+        # Word cloud for visualization
+        if wordcloud_path and os.path.exists(wordcloud_path):
+            report.add_picture(wordcloud_path, width=Inches(WORDCLOUD_REPORT_WIDTH))
+    else:
+        report.add_paragraph(f"No keywords or relevant phrases found in {filename}")
+
+# Function to list the near-duplicate clusters at the end of the report
+def add_duplicate_clusters_to_report(report, records):
+    clusters = {}
+    for record in records:
+        if record.get("duplicate_of"):
+            clusters.setdefault(record["duplicate_of"], []).append(record)
+    if not clusters:
+        return
+
+    report.add_heading("Near-Duplicate Documents", level=1)
+    for canonical_path, duplicates in clusters.items():
+        names = ", ".join(f"{duplicate.get('name', os.path.basename(duplicate['file']))} ({duplicate['similarity']:.0%})"
+                          for duplicate in duplicates)
+        report.add_paragraph(f"{os.path.basename(canonical_path)} (analyzed in full): {names}")
 
 # GUI functionality to load a folder and run analysis
 def load_folder():
@@ -342,59 +1909,318 @@ def load_folder():
 
     report = WordDocument()
     report.add_heading("Enhanced Files Analysis Report", 0)
-    
-    for filename in os.listdir(folder_path):
-        file_path = os.path.join(folder_path, filename)
-        found_words, dates, amounts = None, None, None
-        
-        # Check file type and process accordingly
-        if filename.endswith(".docx"):
-            found_words, dates, amounts = process_word_doc(file_path)
-        elif filename.endswith(".xlsx"):
-            found_words, dates, amounts = process_excel(file_path)
-        elif filename.endswith(".pdf"):
-            found_words, dates, amounts = process_pdf(file_path)
+
+    file_paths = []
+    for filename in sorted(os.listdir(folder_path)):
+        if filename == REPORT_FILENAME:
+            continue  # The report from a previous run is not analyzed
+        if os.path.splitext(filename)[1] in TEXT_EXTRACTORS:
+            file_paths.append(os.path.join(folder_path, filename))
         else:
             print(f"Skipping unsupported file type: {filename}")
-            continue  # Skip unsupported files
-
-        # Add analysis to report if keywords are found
-        if found_words:
-            report.add_heading(f"Analysis for {filename}", level=1)
-            for word, count in found_words.items():
-                report.add_paragraph(f"{word}: {count} occurrences")
-
-            # Add extracted dates and monetary amounts
-            if dates:
-                report.add_paragraph("Dates: " + ", ".join(str(date) for date in dates))
-            if amounts:
-                report.add_paragraph("Monetary Amounts: " + ", ".join(amounts))
-
-            # Generate summary using dynamic summarization
-            summary_text = dynamic_summarization(" ".join(found_words.keys()))
-            report.add_paragraph("Summary: " + summary_text)
-
-            # Generate word cloud for visualization
-            generate_wordcloud(found_words)
-        else:
-            report.add_paragraph(f"No keywords or relevant phrases found in {filename}")
 
-    # Save the report in the selected folder
-    report.save(os.path.join(folder_path, "Enhanced_Files_Analysis_Report.docx"))
-    messagebox.showinfo("Analysis Complete", "Report saved as 'Enhanced_Files_Analysis_Report.docx'")
+    # Cached files are reused; new and changed files are analyzed in parallel.
+    # Word clouds render in their own pool as the records come in.
+    cache_stats = {}
+    records = {}
+    wordclouds = {}
+    wordcloud_pool = start_wordcloud_pool()
+    index = open_index() if INDEX_ENABLED else None
+    try:
+        with tempfile.TemporaryDirectory() as image_dir:
+            for record in analyze_documents(file_paths, cache_stats):
+                records[record["file"]] = record
+                if index is not None:
+                    index_record(index, record)
+                if "error" not in record:
+                    wordclouds[record["file"]] = submit_wordcloud(
+                        wordcloud_pool, found_keywords_of(record), wordcloud_image_path(image_dir, record["file"]))
+
+            # The report is assembled in filename order
+            for file_path in file_paths:
+                file_path = os.path.abspath(file_path)
+                add_analysis_to_report(report, os.path.basename(file_path), records[file_path],
+                                       wordcloud_result(wordclouds.get(file_path)))
+            add_duplicate_clusters_to_report(report, records.values())
+
+            # Save the report in the selected folder
+            report.save(os.path.join(folder_path, REPORT_FILENAME))
+    finally:
+        if wordcloud_pool is not None:
+            wordcloud_pool.shutdown()
+        if index is not None:
+            index.close()
+    messagebox.showinfo("Analysis Complete", f"Report saved as '{REPORT_FILENAME}'\n"
+                        f"Cache: {cache_stats['hits']} unchanged files reused, {cache_stats['misses']} files analyzed")
+
+# Headless Batch Runner
+# Analyzes folders without the GUI and appends one JSON line per document to a results file as
+# soon as the document is finished. A rerun skips every file already analyzed in the results file,
+# so a crashed run resumes where it stopped, and files that failed are tried again. The Word report
+# is rendered from the results file afterwards.
+DEFAULT_RESULTS_FILENAME = "analysis_results.jsonl"
+
+def collect_files(directories, recursive=False, include=(), exclude=()):
+    """Returns (file_path, name) pairs of the supported files in the directories, in sorted order.
+
+    name is the path relative to its directory. include and exclude are glob patterns matched
+    against the name and the file name; with include patterns, a file must match one of them.
+    """
+    files = []
+    for directory in directories:
+        for folder, subfolders, filenames in os.walk(directory):
+            subfolders.sort()
+            if not recursive:
+                subfolders.clear()
+            for filename in sorted(filenames):
+                file_path = os.path.join(folder, filename)
+                name = os.path.relpath(file_path, directory)
+                if filename == REPORT_FILENAME or os.path.splitext(filename)[1] not in TEXT_EXTRACTORS:
+                    continue
+                if include and not any(fnmatch(name, pattern) or fnmatch(filename, pattern) for pattern in include):
+                    continue
+                if any(fnmatch(name, pattern) or fnmatch(filename, pattern) for pattern in exclude):
+                    continue
+                files.append((file_path, name))
+    return files
+
+def read_completed_files(results_path):
+    """Returns the files already analyzed in a results file.
+
+    A partly written last line is cut off. Records of files that failed are removed from the file,
+    so those files are analyzed again and get a fresh record.
+    """
+    completed = set()
+    if not os.path.exists(results_path):
+        return completed
+    complete_size = 0
+    failed_lines = 0
+    with open(results_path, "r+b") as f:
+        for line in f:
+            if not line.endswith(b"\n"):
+                break
+            complete_size += len(line)
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if "error" in record:
+                failed_lines += 1
+            elif "file" in record:
+                completed.add(record["file"])
+        f.truncate(complete_size)
+
+    if failed_lines:
+        with open(results_path, "rb") as f, open(results_path + ".tmp", "wb") as kept:
+            for line in f:
+                try:
+                    if "error" in json.loads(line):
+                        continue
+                except ValueError:
+                    pass
+                kept.write(line)
+        os.replace(results_path + ".tmp", results_path)
+        print(f"Retrying {failed_lines} files that failed in an earlier run")
+    return completed
+
+def iter_result_records(results_path):
+    """Yields the records of a results file one at a time."""
+    with open(results_path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                yield json.loads(line)
+            except ValueError:
+                continue
+
+def render_report_from_results(results_path, report_path):
+    """Writes the Word report from a results file, reading one record at a time."""
+    report = WordDocument()
+    report.add_heading("Enhanced Files Analysis Report", 0)
+    duplicates = []
+    for record in iter_result_records(results_path):
+        add_analysis_to_report(report, record.get("name", os.path.basename(record["file"])), record, record.get("wordcloud"))
+        if record.get("duplicate_of"):
+            duplicates.append(record)
+    add_duplicate_clusters_to_report(report, duplicates)
+    report.save(report_path)
+
+def run_headless(directories, results_path, recursive=False, include=(), exclude=(), resume=True,
+                 report_path=None, workers=PARALLEL_WORKERS, timeout=FILE_TIMEOUT,
+                 wordclouds=WORDCLOUDS_ENABLED, wordcloud_size=(WORDCLOUD_WIDTH, WORDCLOUD_HEIGHT),
+                 index_path=INDEX_PATH, deduplicate=DEDUP_ENABLED, dedup_threshold=DEDUP_THRESHOLD,
+                 analyze_differences=DEDUP_ANALYZE_DIFFERENCES, summarizer=None):
+    """Analyzes the supported files of the directories and streams their records to results_path.
+
+    Word cloud images are written next to the results file, in <results name>_wordclouds. Each
+    record is also added to the corpus index at index_path, unless index_path is None.
+    """
+    names = {os.path.abspath(file_path): name for file_path, name in collect_files(directories, recursive, include, exclude)}
+    completed = read_completed_files(results_path) if resume else set()
+    file_paths = [file_path for file_path in names if file_path not in completed]
+    print(f"{len(file_paths)} files to analyze, {len(names) - len(file_paths)} already in {results_path}")
+
+    image_dir = os.path.splitext(results_path)[0] + "_wordclouds"
+    wordcloud_pool = start_wordcloud_pool(wordclouds)
+    if wordcloud_pool is not None:
+        os.makedirs(image_dir, exist_ok=True)
+    index = open_index(index_path) if index_path else None
+    try:
+        with open(results_path, "a" if resume else "w", encoding="utf-8") as results:
+            for record in analyze_documents(file_paths, workers=workers, timeout=timeout, deduplicate=deduplicate,
+                                            dedup_threshold=dedup_threshold, analyze_differences=analyze_differences,
+                                            summarizer=summarizer):
+                record["name"] = names[record["file"]]
+                if "error" not in record:
+                    image_path = wordcloud_image_path(image_dir, record["file"])
+                    future = submit_wordcloud(wordcloud_pool, found_keywords_of(record), image_path, *wordcloud_size)
+                    record["wordcloud"] = image_path if future is not None else None
+                results.write(json.dumps(record) + "\n")
+                results.flush()
+                if index is not None:
+                    index_record(index, record)
+    finally:
+        # Waits for the word clouds still being rendered
+        if wordcloud_pool is not None:
+            wordcloud_pool.shutdown()
+        if index is not None:
+            index.close()
+
+    if report_path:
+        render_report_from_results(results_path, report_path)
+        print(f"Report saved as '{report_path}'")
+
+def similarity_threshold(value):
+    """Parses --dedup-threshold, rejecting thresholds the near-duplicate index cannot band."""
+    threshold = float(value)
+    try:
+        lsh_bands(threshold)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+    return threshold
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Legal document analyzer. Starts the GUI when no directories are given.")
+    parser.add_argument("directories", nargs="*", help="Directories to analyze without the GUI")
+    parser.add_argument("-o", "--output", default=DEFAULT_RESULTS_FILENAME, help="JSONL results file (default: %(default)s)")
+    parser.add_argument("-r", "--recursive", action="store_true", help="Also analyze files in subdirectories")
+    parser.add_argument("--include", action="append", default=[], metavar="GLOB", help="Only analyze files matching this pattern (repeatable)")
+    parser.add_argument("--exclude", action="append", default=[], metavar="GLOB", help="Skip files matching this pattern (repeatable)")
+    parser.add_argument("--no-resume", action="store_true", help="Start a new results file instead of resuming")
+    parser.add_argument("--report", metavar="DOCX", help="Render a Word report from the results when done")
+    parser.add_argument("--workers", type=int, default=PARALLEL_WORKERS, help="Worker processes (default: %(default)s)")
+    parser.add_argument("--timeout", type=float, default=FILE_TIMEOUT, help="Seconds allowed per file (default: %(default)s)")
+    parser.add_argument("--no-wordclouds", action="store_true", help="Skip word clouds for faster runs")
+    parser.add_argument("--wordcloud-size", default=f"{WORDCLOUD_WIDTH}x{WORDCLOUD_HEIGHT}", metavar="WxH",
+                        help="Word cloud image size in pixels (default: %(default)s)")
+    parser.add_argument("--clear-cache", action="store_true", help="Delete all cached analyses and exit")
+    parser.add_argument("--summarizer", choices=sorted(SUMMARIZER_BACKENDS), default=SUMMARIZER_BACKEND,
+                        help="Summarization backend (default: %(default)s)")
+    parser.add_argument("--summarizer-model", metavar="PATH",
+                        help="Summarize with this local checkpoint (a downloaded model name or a directory)")
+    parser.add_argument("--summarizer-threads", type=int, help="Intra-op threads for summarization (default: torch default)")
+    parser.add_argument("--index", default=INDEX_PATH, metavar="DB", help="Corpus index database (default: %(default)s)")
+    parser.add_argument("--no-index", action="store_true", help="Do not add the results to the corpus index")
+    parser.add_argument("--no-dedup", action="store_true", help="Analyze near-duplicate files in full")
+    parser.add_argument("--dedup-threshold", type=similarity_threshold, default=DEDUP_THRESHOLD,
+                        help="Similarity above which files are near-duplicates (default: %(default)s)")
+    parser.add_argument("--dedup-copy", action="store_true",
+                        help="Copy the canonical analysis to near-duplicates without analyzing their differing sections")
+
+    query = parser.add_argument_group("query mode", "Search the corpus index instead of analyzing files")
+    query.add_argument("--query", action="store_true", help="Print the indexed documents matching all the filters as JSON lines")
+    query.add_argument("--term", action="append", default=[], help="Keyword the document must contain (repeatable)")
+    query.add_argument("--entity", action="append", default=[], help="Named entity the document must contain (repeatable)")
+    query.add_argument("--date-from", metavar="YYYY-MM-DD", help="Document must mention a date on or after this day")
+    query.add_argument("--date-to", metavar="YYYY-MM-DD", help="Document must mention a date on or before this day")
+    query.add_argument("--amount-min", type=float, help="Document must mention an amount of at least this value")
+    query.add_argument("--amount-max", type=float, help="Document must mention an amount of at most this value")
+    query.add_argument("--currency", help="Only count amounts in this currency (USD, GBP or EUR)")
+    query.add_argument("--limit", type=int, help="Return at most this many documents")
+    return parser.parse_args(argv)
+
+def run_query(args):
+    """Prints the documents in the corpus index that match the query options, one JSON line each."""
+    if not os.path.exists(args.index):
+        print(f"No corpus index at {args.index}")
+        return
+    connection = open_index(args.index)
+    try:
+        start = time.perf_counter()
+        results = query_index(connection, args.term, args.entity, args.date_from, args.date_to,
+                              args.amount_min, args.amount_max, args.currency, args.limit)
+        seconds = time.perf_counter() - start
+    finally:
+        connection.close()
+    for result in results:
+        print(json.dumps(result))
+    print(f"{len(results)} documents found in {seconds * 1000:.1f} ms")
+
+# GUI functionality to invalidate the result cache
+def clear_cache_command():
+    removed = clear_cache()
+    messagebox.showinfo("Cache Cleared", f"Removed {removed} cached analyses")
+
+# Function to load the keyword index and models in the background
+def preload_components():
+    try:
+        get_keyword_matcher(get_expanded_keywords())
+        get_nlp()
+        get_summarizer()
+    except Exception as e:
+        print("Error preloading components:", e)
 
 # Set up GUI
-root = tk.Tk()
-root.title("Document Analysis Tool")
-root.geometry("400x200")
+def run_gui():
+    root = tk.Tk()
+    root.title("Document Analysis Tool")
+    root.geometry("400x250")
 
-label = tk.Label(root, text="Select a folder to analyze and press Load Folder:")
-label.pack(pady=10)
+    label = tk.Label(root, text="Select a folder to analyze and press Load Folder:")
+    label.pack(pady=10)
 
-load_button = tk.Button(root, text="Load Folder", command=load_folder)
-load_button.pack(pady=10)
+    load_button = tk.Button(root, text="Load Folder", command=load_folder)
+    load_button.pack(pady=10)
 
-root.mainloop()
+    clear_cache_button = tk.Button(root, text="Clear Cache", command=clear_cache_command)
+    clear_cache_button.pack(pady=10)
 
+    status_label = tk.Label(root, text="Loading models in the background...")
+    status_label.pack(pady=5)
 
+    # Models load in a background thread once the window is idle; the status shows their load times
+    preload_thread = threading.Thread(target=preload_components, daemon=True)
 
+    def show_load_status():
+        if preload_thread.is_alive():
+            root.after(250, show_load_status)
+        else:
+            load_times = ", ".join(f"{name} {seconds:.1f}s" for name, seconds in COMPONENT_LOAD_TIMES.items())
+            status_label.config(text=f"Ready ({load_times})")
+
+    def start_preload():
+        COMPONENT_LOAD_TIMES["window"] = time.perf_counter() - _startup_time
+        print(f"Window ready in {COMPONENT_LOAD_TIMES['window']:.2f}s")
+        preload_thread.start()
+        show_load_status()
+
+    root.after_idle(start_preload)
+    root.mainloop()
+
+# The GUI or batch run only starts when the script is run directly, so worker processes can import it
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    args = parse_args()
+    if args.clear_cache:
+        print(f"Removed {clear_cache()} cached analyses")
+    elif args.query:
+        run_query(args)
+    elif args.directories:
+        wordcloud_size = tuple(int(size) for size in args.wordcloud_size.lower().split("x"))
+        run_headless(args.directories, args.output, args.recursive, args.include, args.exclude,
+                     resume=not args.no_resume, report_path=args.report, workers=args.workers, timeout=args.timeout,
+                     wordclouds=not args.no_wordclouds, wordcloud_size=wordcloud_size,
+                     index_path=None if args.no_index else args.index, deduplicate=not args.no_dedup,
+                     dedup_threshold=args.dedup_threshold, analyze_differences=not args.dedup_copy,
+                     summarizer=summarizer_backend(args.summarizer, args.summarizer_threads, args.summarizer_model))
+    else:
+        run_gui()